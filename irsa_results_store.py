@@ -0,0 +1,264 @@
+#%%
+# Results store shared by the simulation scripts: content-addressed storage of the simulated points,
+# keyed on their parameters, their seed and the version of the code, with size-bounded eviction,
+# and the parallel sweep runner persisting the points in the store
+
+import os
+import json
+import hashlib
+import inspect
+import tempfile
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import tensorflow as tf
+
+def get_code_version(*code_objects):
+    """
+    Get the version of the simulation code: the SHA-256 hash of the sources of the given functions, classes and modules.
+
+    Only the code producing the results is hashed, so editing the plotting cells of a script keeps its stored results.
+
+    Args:
+        code_objects: Functions, classes and modules of the simulation (see get_simulation_code).
+
+    Returns:
+        code_version: The hexadecimal code version, or None if a source is not available (e.g. in a notebook).
+    """
+    code_hash = hashlib.sha256()
+    for code_object in code_objects:
+        try:
+            code_hash.update(inspect.getsource(code_object).encode())
+        except (OSError, TypeError):
+            return None
+    return code_hash.hexdigest()[:16]
+
+def get_simulation_code(namespace):
+    """
+    Get the functions and classes defined so far in the namespace of a script, i.e. its simulation code
+    when called after the simulation cells and before the plotting cells.
+
+    Args:
+        namespace: Global namespace of the script (its globals()).
+
+    Returns:
+        code_objects: List of the functions and classes of the script, in the order of their definition.
+    """
+    return [value for value in namespace.values()
+            if (inspect.isfunction(value) or inspect.isclass(value)) and value.__module__ == namespace.get('__name__')]
+
+def to_json_compatible(value):
+    """
+    Convert a value to plain Python types that JSON can encode: NumPy arrays become lists and NumPy
+    scalars become Python numbers, recursively inside dictionaries, lists and tuples.
+
+    Args:
+        value: The value to convert.
+
+    Returns:
+        value: The converted value.
+    """
+    if isinstance(value, dict):
+        return {key: to_json_compatible(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json_compatible(item) for item in value]
+    if isinstance(value, (np.ndarray, np.generic)):
+        return to_json_compatible(value.tolist())
+    return value
+
+def get_point_fingerprint(point, code_version=None):
+    """
+    Get the fingerprint of a sweep point: the SHA-256 hash of its canonical JSON encoding.
+
+    Args:
+        point: Sweep point with all its parameters, including its seed (NumPy values are converted, see to_json_compatible).
+        code_version: Optional version of the simulation code (see get_code_version) hashed with the point.
+
+    Returns:
+        fingerprint: The hexadecimal fingerprint of the point.
+    """
+    point = to_json_compatible(point)
+    if code_version is not None:
+        point = {"point": point, "code_version": code_version}
+    canonical_point = json.dumps(point, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical_point.encode()).hexdigest()
+
+def write_json_atomic(file_path, data):
+    """
+    Write a JSON file atomically: the data is written to a temporary file of the same directory,
+    which is then renamed, so a crash never leaves a partially written file.
+
+    Args:
+        file_path: Path of the JSON file.
+        data: Data to write.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as temp_file:
+        json.dump(data, temp_file)
+        temp_file.flush()
+        os.fsync(temp_file.fileno())
+    os.replace(temp_file.name, file_path)
+
+def load_point_result(store_dir, fingerprint):
+    """
+    Load the record of a completed point from the results store.
+
+    The store is a content-addressed cache: every point is stored in its own file named after its fingerprint,
+    whose modification time is refreshed on every hit so that the least recently used points are evicted first.
+
+    Args:
+        store_dir: Directory of the results store.
+        fingerprint: Fingerprint of the point (see get_point_fingerprint).
+
+    Returns:
+        record: The record of the point, or None if the point is not in the store.
+    """
+    file_path = os.path.join(store_dir, f"{fingerprint}.json")
+    if not os.path.isfile(file_path):
+        return None
+    with open(file_path) as f:
+        record = json.load(f)
+    os.utime(file_path)
+    return record
+
+def save_point_result(store_dir, point, result, code_version=None):
+    """
+    Persist the result of a completed point in the results store.
+
+    Every point is written atomically to its own file named after its fingerprint, which covers
+    the parameters of the point, its seed and the version of the code.
+
+    Args:
+        store_dir: Directory of the results store.
+        point: The completed sweep point.
+        result: The result of the point.
+        code_version: Optional version of the simulation code (see get_code_version).
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    point = to_json_compatible(point)
+    fingerprint = get_point_fingerprint(point, code_version)
+    record = {
+        "fingerprint": fingerprint,
+        "point": point,
+        "seed": point.get("seed"),
+        "code_version": code_version,
+        "result": to_json_compatible(result),
+        "completed_at": datetime.now().isoformat()
+    }
+    write_json_atomic(os.path.join(store_dir, f"{fingerprint}.json"), record)
+
+def evict_results_store(store_dir, max_store_size):
+    """
+    Bound the size of the results store by deleting its least recently used points.
+
+    Args:
+        store_dir: Directory of the results store.
+        max_store_size: Maximum size of the store in bytes.
+
+    Returns:
+        num_evicted: Number of evicted points.
+    """
+    if not os.path.isdir(store_dir):
+        return 0
+    entries = []
+    for file_name in os.listdir(store_dir):
+        if file_name.endswith('.json'):
+            file_stat = os.stat(os.path.join(store_dir, file_name))
+            entries.append((file_stat.st_mtime, file_stat.st_size, file_name))
+    store_size = sum(size for _, size, _ in entries)
+    num_evicted = 0
+    for _, size, file_name in sorted(entries):
+        if store_size <= max_store_size:
+            break
+        os.remove(os.path.join(store_dir, file_name))
+        store_size -= size
+        num_evicted += 1
+    return num_evicted
+
+def memoize_point(store_dir, point, compute_result, code_version=None, max_store_size=None):
+    """
+    Get the result of a point from the results store, computing and storing it on a miss.
+
+    Args:
+        store_dir: Directory of the results store.
+        point: The point with all its parameters, including its seed.
+        compute_result: Function without arguments computing the (JSON serializable) result of the point.
+        code_version: Optional version of the simulation code (see get_code_version).
+        max_store_size: Optional maximum size of the store in bytes, beyond which the least recently used points are evicted.
+
+    Returns:
+        result: The result of the point.
+    """
+    record = load_point_result(store_dir, get_point_fingerprint(point, code_version))
+    if record is not None:
+        return record["result"]
+    result = compute_result()
+    save_point_result(store_dir, point, result, code_version)
+    if max_store_size is not None:
+        evict_results_store(store_dir, max_store_size)
+    return result
+
+def init_sweep_worker(num_intra_op_threads, num_inter_op_threads):
+    """
+    Set the TensorFlow thread budget of a sweep worker process.
+
+    Args:
+        num_intra_op_threads: Number of threads used inside an operation.
+        num_inter_op_threads: Number of operations run concurrently.
+    """
+    tf.config.threading.set_intra_op_parallelism_threads(num_intra_op_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(num_inter_op_threads)
+
+def run_sweep_parallel(run_sweep_point, points, num_workers=None, store_dir=None, max_store_size=None, code_version=None):
+    """
+    Run the sweep points in a pool of worker processes.
+
+    The workers are spawned (TensorFlow is not fork-safe) and the cores are split between them, each
+    worker getting its own intra-op thread budget so that the cores are not oversubscribed.
+    With a results store, every point is persisted as soon as it completes and the points already
+    in the store are not run again, so an interrupted sweep resumes where it stopped and re-plotting
+    a sweep only reads the store. Editing the code invalidates the stored points.
+
+    Args:
+        run_sweep_point: Module-level function running one sweep point and returning its (JSON serializable) result.
+        points: List of sweep points.
+        num_workers: Number of worker processes, by default the number of cores (at most the number of points).
+        store_dir: Optional directory of the results store.
+        max_store_size: Optional maximum size of the store in bytes, beyond which the least recently used points are evicted.
+        code_version: Optional version of the simulation code (see get_code_version), part of the key of the stored points.
+
+    Returns:
+        results: List of the results of the points, in the order of the points.
+    """
+    # Skip the points already completed in the store
+    results = [None] * len(points)
+    pending = []
+    for index, point in enumerate(points):
+        record = load_point_result(store_dir, get_point_fingerprint(point, code_version)) if store_dir is not None else None
+        if record is not None:
+            results[index] = record["result"]
+        else:
+            pending.append(index)
+    if not pending:
+        return results
+
+    num_cores = os.cpu_count() or 1
+    if num_workers is None:
+        num_workers = min(num_cores, len(pending))
+    num_workers = max(1, num_workers)
+    num_intra_op_threads = max(1, num_cores // num_workers)
+
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=init_sweep_worker, initargs=(num_intra_op_threads, 1)) as executor:
+        futures = {executor.submit(run_sweep_point, points[index]): index for index in pending}
+        for future in as_completed(futures):
+            index = futures[future]
+            results[index] = future.result()
+            if store_dir is not None:
+                save_point_result(store_dir, points[index], results[index], code_version)
+                if max_store_size is not None:
+                    evict_results_store(store_dir, max_store_size)
+
+    return results
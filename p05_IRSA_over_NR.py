@@ -16,6 +16,7 @@ import matplotlib.pyplot as plt
 
 # for performance measurements
 import time
+from collections import OrderedDict
 
 # Importing the required classes from the sionna library
 from sionna.mapping import Constellation, Mapper, Demapper
@@ -227,18 +228,29 @@ def pass_through_awgn(irsa_frame, ebno_db, simulation_params):
     received_frame = awgn_channel([irsa_frame, no])
 
     return received_frame, no
-def decode_slot(received_rg, no, simulation_params):
+
+# Maximum number of receiver chains kept in the cache
+RECEIVER_CHAIN_CACHE_SIZE = 8
+
+# Receiver chains built so far, ordered from the least to the most recently used
+receiver_chain_cache = OrderedDict()
+
+# Number of cache hits and misses
+receiver_chain_cache_stats = {"hits": 0, "misses": 0}
+
+def get_receiver_chain(simulation_params):
     """
-    Decode a single slot and output the estimated bits and channel coefficients.
+    Get the receiver chain objects for the given simulation parameters.
+
+    The chain is cached with LRU eviction and keyed on the carrier and transport block parameters,
+    so the LDPC graph and the channel estimator are built only once per configuration.
 
     Args:
-        received_rg: The received resource grid for the slot.
-        no: The noise variance.
         simulation_params: Dictionary containing all simulation parameters.
 
     Returns:
-        bits_hat: The estimated bits.
-        h_hat: The estimated channel coefficients.
+        receiver_chain: Dictionary containing the resource grid, demapper, encoder, decoder,
+                        LS channel estimator and the indices of the data OFDM symbols.
     """
     # Extract necessary parameters from the simulation_params dictionary
     carrier_params = simulation_params["Carrier parameters"]
@@ -246,12 +258,20 @@ def decode_slot(received_rg, no, simulation_params):
     num_resource_blocks = carrier_params['num_resource_blocks']
     num_ofdm_symbols = carrier_params['num_ofdm_symbols']
     pilot_indices = carrier_params['pilot_indices']
-    data_indices = np.setdiff1d(np.arange(num_ofdm_symbols), pilot_indices)
 
     transport_block_params = simulation_params["Transport block parameters"]
     num_bits_per_symbol = transport_block_params['num_bits_per_symbol']
     coderate = transport_block_params['coderate']
 
+    key = (numerology, num_resource_blocks, num_ofdm_symbols, tuple(pilot_indices), num_bits_per_symbol, coderate)
+
+    # Reuse the cached chain if it exists
+    if key in receiver_chain_cache:
+        receiver_chain_cache_stats["hits"] += 1
+        receiver_chain_cache.move_to_end(key)
+        return receiver_chain_cache[key]
+    receiver_chain_cache_stats["misses"] += 1
+
     # Create instances of needed objects
     resource_grid_config = sn.ofdm.ResourceGrid(
         num_ofdm_symbols=num_ofdm_symbols,
@@ -272,7 +292,45 @@ def decode_slot(received_rg, no, simulation_params):
     # LDPC Decoder: Decodes the coded bits back into information bits
     decoder = sn.fec.ldpc.LDPC5GDecoder(encoder, hard_out=True)
 
+    # Least Squares Channel Estimator: Estimates the channel coefficients
     ls_est = sn.ofdm.LSChannelEstimator(resource_grid_config, interpolation_type="nn")
+
+    receiver_chain = {
+        "resource_grid_config": resource_grid_config,
+        "demapper": demapper,
+        "encoder": encoder,
+        "decoder": decoder,
+        "ls_est": ls_est,
+        "data_indices": np.setdiff1d(np.arange(num_ofdm_symbols), pilot_indices)
+    }
+
+    # Add the new chain and evict the least recently used one if the cache is full
+    receiver_chain_cache[key] = receiver_chain
+    if len(receiver_chain_cache) > RECEIVER_CHAIN_CACHE_SIZE:
+        receiver_chain_cache.popitem(last=False)
+
+    return receiver_chain
+
+def decode_slot(received_rg, no, simulation_params):
+    """
+    Decode a single slot and output the estimated bits and channel coefficients.
+
+    Args:
+        received_rg: The received resource grid for the slot.
+        no: The noise variance.
+        simulation_params: Dictionary containing all simulation parameters.
+
+    Returns:
+        bits_hat: The estimated bits.
+        h_hat: The estimated channel coefficients.
+    """
+    # Get the (cached) receiver chain objects
+    receiver_chain = get_receiver_chain(simulation_params)
+    demapper = receiver_chain["demapper"]
+    decoder = receiver_chain["decoder"]
+    ls_est = receiver_chain["ls_est"]
+    data_indices = receiver_chain["data_indices"]
+
     h_hat, err_var = ls_est([tf.expand_dims(tf.expand_dims(tf.expand_dims(received_rg, axis=0), axis=1), axis=1), no])
     h_hat = tf.squeeze(h_hat)
     received_rg_equalized = received_rg / h_hat
@@ -330,6 +388,13 @@ def decode_irsa_frame(received_frame, no, simulation_params, resource_grid_list,
     slots_to_decode = list(range(num_slots_per_frame))
     undecoded_ues = list(range(num_ues))
 
+    # Inverse index built once per frame: the UEs that transmitted a replica in each slot,
+    # so that a decoded slot is only compared against the UEs that collide in it
+    slot_ues = {slot_index: [] for slot_index in range(num_slots_per_frame)}
+    for ue, replicas_indices in enumerate(replicas_indices_list):
+        for slot_index in replicas_indices:
+            slot_ues[slot_index].append(ue)
+
     pass_num = 1
     while slots_to_decode:
         print(f"\nPass {pass_num}:")
@@ -343,7 +408,7 @@ def decode_irsa_frame(received_frame, no, simulation_params, resource_grid_list,
             decoded_bits.append(bits_hat)
 
             
-            for i in undecoded_ues:
+            for i in [ue for ue in slot_ues[slot_index] if ue in undecoded_ues]:
                 is_match = tf.reduce_all(tf.equal(bits_hat, original_bits_list[i]))
                 print(f"    UE {i+1} : {is_match.numpy()}")
 
@@ -14,6 +14,7 @@ import matplotlib.pyplot as plt
 
 # for performance measurements
 import time
+from collections import OrderedDict
 
 # Importing the required classes from the sionna library
 from sionna.mapping import Constellation, Mapper, Demapper
@@ -24,6 +25,9 @@ from sionna.signal import Upsampling, Downsampling, RootRaisedCosineFilter, empi
 import os
 import json
 
+import irsa_results_store
+from irsa_results_store import get_code_version, get_simulation_code, get_point_fingerprint, write_json_atomic, run_sweep_parallel
+
 # Allow memory growth for GPU
 gpus = tf.config.experimental.list_physical_devices('GPU')
 for gpu in gpus:
@@ -33,13 +37,15 @@ print("The required libraries are imported successfully!")
 print('sionna version:', sn.__version__)
 
 #%%
-def generate_ue_resource_grid(simulation_params, batch_size):
+def generate_ue_resource_grid(simulation_params, batch_size, rng=None):
     """
     Create the UE resource grids to be transmitted and the indices of the replicas for one UE.
 
     Args:
         simulation_params (dict): Dictionary containing all simulation parameters.
         batch_size (int): The batch size for the simulation.
+        rng (tf.random.Generator): Optional generator of the bits (or of the codewords drawn from the pool),
+                                   by default the global generator is used.
 
     Returns:
         tf.Tensor: The UE resource grids to be transmitted.
@@ -55,6 +61,14 @@ def generate_ue_resource_grid(simulation_params, batch_size):
     transport_block_params = simulation_params["Transport block parameters"]
     num_bits_per_symbol = transport_block_params['num_bits_per_symbol']
     coderate = transport_block_params['coderate']
+    codeword_pool_size = transport_block_params.get('codeword_pool_size')
+
+    # Draw the codewords with replacement from the pre-encoded pool if enabled
+    if codeword_pool_size:
+        codeword_pool = get_codeword_pool(simulation_params)
+        uniform = tf.random.uniform if rng is None else rng.uniform
+        codeword_ids = uniform([batch_size], maxval=codeword_pool_size, dtype=tf.int32)
+        return tf.gather(codeword_pool["resource_grids"], codeword_ids), tf.gather(codeword_pool["bits"], codeword_ids)
 
     # Create the resource grid object
     resource_grid_config = sn.ofdm.ResourceGrid(
@@ -84,7 +98,10 @@ def generate_ue_resource_grid(simulation_params, batch_size):
     resource_grid_mapper = sn.ofdm.ResourceGridMapper(resource_grid_config)
     
     # Generate random binary bits for the UE
-    bits = binary_source([batch_size, k])
+    if rng is None:
+        bits = binary_source([batch_size, k])
+    else:
+        bits = tf.cast(rng.uniform([batch_size, k], minval=0, maxval=2, dtype=tf.int32), tf.float32)
     
     # Encode the bits using LDPC encoder
     codewords = encoder(bits)
@@ -100,7 +117,44 @@ def generate_ue_resource_grid(simulation_params, batch_size):
     
     return resource_grid, bits
 
-def generate_resource_grid(simulation_params, batch_size, num_ues):
+# Pre-encoded codeword pools built so far, keyed on the carrier and transport block parameters and the pool seed
+codeword_pool_cache = {}
+
+def get_codeword_pool(simulation_params):
+    """
+    Get the pool of pre-encoded codewords for the given simulation parameters.
+
+    The codeword_pool_size codewords of the pool are drawn, LDPC encoded, mapped and placed on the resource
+    grid only once per configuration, so generating the UE resource grids reduces to a gather from the pool.
+    The pool is drawn from its own generator seeded with the codeword_pool_seed, so it does not depend on
+    which sweep point builds it first in a worker, nor shifts the random draws of that point.
+
+    Args:
+        simulation_params (dict): Dictionary containing all simulation parameters, with the codeword_pool_size
+                                  (and optionally the codeword_pool_seed) in the transport block parameters.
+
+    Returns:
+        dict: Dictionary containing the resource grids and the bits of the codewords of the pool.
+    """
+    carrier_params = simulation_params["Carrier parameters"]
+    transport_block_params = simulation_params["Transport block parameters"]
+    codeword_pool_size = transport_block_params['codeword_pool_size']
+    codeword_pool_seed = transport_block_params.get('codeword_pool_seed', 0)
+
+    key = (carrier_params['numerology'], carrier_params['num_resource_blocks'], carrier_params['num_ofdm_symbols'],
+           tuple(carrier_params['pilot_indices']), transport_block_params['num_bits_per_symbol'],
+           transport_block_params['coderate'], codeword_pool_size, codeword_pool_seed)
+
+    if key not in codeword_pool_cache:
+        # Encode the codewords of the pool as one batch
+        pool_params = dict(simulation_params, **{"Transport block parameters": dict(transport_block_params, codeword_pool_size=None)})
+        pool_rng = tf.random.Generator.from_seed(codeword_pool_seed, alg="philox")
+        resource_grids, bits = generate_ue_resource_grid(pool_params, codeword_pool_size, pool_rng)
+        codeword_pool_cache[key] = {"resource_grids": resource_grids, "bits": bits}
+
+    return codeword_pool_cache[key]
+
+def generate_resource_grid(simulation_params, batch_size, num_ues, rng=None):
     """
     Generate resource grids for multiple UEs with interference and optional phase shift.
 
@@ -108,6 +162,8 @@ def generate_resource_grid(simulation_params, batch_size, num_ues):
         simulation_params (dict): Dictionary containing all simulation parameters.
         batch_size (int): The batch size for the simulation.
         num_ues (int): The number of UEs in the simulation.
+        rng (tf.random.Generator): Optional generator of the bits and of the phase shifts of the UEs,
+                                   by default the global generator is used.
 
     Returns:
         tf.Tensor: The interfered resource grids.
@@ -127,12 +183,12 @@ def generate_resource_grid(simulation_params, batch_size, num_ues):
 
     # Generate resource grids, bits, and channels for each UE
     for _ in range(num_ues):
-        resource_grid, bits = generate_ue_resource_grid(simulation_params, batch_size)
+        resource_grid, bits = generate_ue_resource_grid(simulation_params, batch_size, rng)
         
         # Apply phase shift if specified
         if is_phase_shift_applied:
             # Step 1: Create the angle
-            angles = 2 * np.pi * tf.random.uniform(shape=[batch_size], minval=0, maxval=1)
+            angles = 2 * np.pi * (tf.random.uniform if rng is None else rng.uniform)(shape=[batch_size], minval=0, maxval=1)
             # Expand the angles to match the resource grid shape
             angles = tf.expand_dims(tf.expand_dims(angles, axis=1), axis=1) 
             # Step 2: Calculate the channel coefficients
@@ -240,18 +296,28 @@ def remove_interference(y_resource_grids, resource_grid_list, channels, is_perfe
 
     return y_resource_grids_cleaned, interference_noise_energy
 
-def decode_slot(received_rg, no, simulation_params, batch_size):
+# Maximum number of receiver chains kept in the cache
+RECEIVER_CHAIN_CACHE_SIZE = 8
+
+# Receiver chains built so far, ordered from the least to the most recently used
+receiver_chain_cache = OrderedDict()
+
+# Number of cache hits and misses
+receiver_chain_cache_stats = {"hits": 0, "misses": 0}
+
+def get_receiver_chain(simulation_params):
     """
-    Decode a single slot and output the estimated bits and channel coefficients.
+    Get the receiver chain objects for the given simulation parameters.
+
+    The chain is cached with LRU eviction and keyed on the carrier and transport block parameters,
+    so the LDPC graph and the channel estimator are built only once per configuration.
 
     Args:
-        received_rg (tf.Tensor): The received resource grid for the slot.
-        no (float): The noise variance.
-        simulation_params (dict): Dictionary containing all simulation parameters.
+        simulation_params: Dictionary containing all simulation parameters.
 
     Returns:
-        tf.Tensor: The estimated bits.
-        tf.Tensor: The estimated channel coefficients.
+        receiver_chain: Dictionary containing the resource grid, demapper, encoder, decoder,
+                        LS channel estimator and the indices of the data OFDM symbols.
     """
     # Extract necessary parameters from the simulation_params dictionary
     carrier_params = simulation_params["Carrier parameters"]
@@ -259,12 +325,20 @@ def decode_slot(received_rg, no, simulation_params, batch_size):
     num_resource_blocks = carrier_params['num_resource_blocks']
     num_ofdm_symbols = carrier_params['num_ofdm_symbols']
     pilot_indices = carrier_params['pilot_indices']
-    data_indices = np.setdiff1d(np.arange(num_ofdm_symbols), pilot_indices)
 
     transport_block_params = simulation_params["Transport block parameters"]
     num_bits_per_symbol = transport_block_params['num_bits_per_symbol']
     coderate = transport_block_params['coderate']
 
+    key = (numerology, num_resource_blocks, num_ofdm_symbols, tuple(pilot_indices), num_bits_per_symbol, coderate)
+
+    # Reuse the cached chain if it exists
+    if key in receiver_chain_cache:
+        receiver_chain_cache_stats["hits"] += 1
+        receiver_chain_cache.move_to_end(key)
+        return receiver_chain_cache[key]
+    receiver_chain_cache_stats["misses"] += 1
+
     # Create instances of needed objects
     resource_grid_config = sn.ofdm.ResourceGrid(
         num_ofdm_symbols=num_ofdm_symbols,
@@ -287,6 +361,42 @@ def decode_slot(received_rg, no, simulation_params, batch_size):
 
     # Least Squares Channel Estimator: Estimates the channel coefficients
     ls_est = sn.ofdm.LSChannelEstimator(resource_grid_config, interpolation_type="nn")
+
+    receiver_chain = {
+        "resource_grid_config": resource_grid_config,
+        "demapper": demapper,
+        "encoder": encoder,
+        "decoder": decoder,
+        "ls_est": ls_est,
+        "data_indices": np.setdiff1d(np.arange(num_ofdm_symbols), pilot_indices)
+    }
+
+    # Add the new chain and evict the least recently used one if the cache is full
+    receiver_chain_cache[key] = receiver_chain
+    if len(receiver_chain_cache) > RECEIVER_CHAIN_CACHE_SIZE:
+        receiver_chain_cache.popitem(last=False)
+
+    return receiver_chain
+
+def decode_slot(received_rg, no, simulation_params, batch_size):
+    """
+    Decode a single slot and output the estimated bits and channel coefficients.
+
+    Args:
+        received_rg (tf.Tensor): The received resource grid for the slot.
+        no (float): The noise variance.
+        simulation_params (dict): Dictionary containing all simulation parameters.
+
+    Returns:
+        tf.Tensor: The estimated bits.
+        tf.Tensor: The estimated channel coefficients.
+    """
+    # Get the (cached) receiver chain objects
+    receiver_chain = get_receiver_chain(simulation_params)
+    demapper = receiver_chain["demapper"]
+    decoder = receiver_chain["decoder"]
+    ls_est = receiver_chain["ls_est"]
+    data_indices = receiver_chain["data_indices"]
     
     # Start the decoding process
     
@@ -310,7 +420,7 @@ def decode_slot(received_rg, no, simulation_params, batch_size):
     return bits_hat, h_hat
 
 # @tf.function() # Enable graph execution to speed things up
-def run_simulation(simulation_params, ebno_db, batch_size, num_ues):
+def run_simulation(simulation_params, ebno_db, batch_size, num_ues, rng=None):
     """
     Run the simulation with the given parameters and Eb/No value.
 
@@ -319,6 +429,7 @@ def run_simulation(simulation_params, ebno_db, batch_size, num_ues):
         ebno_db (float): The Eb/No value in dB.
         batch_size (int): The batch size for the simulation.
         num_ues (int): The number of UEs in the simulation.
+        rng (tf.random.Generator): Optional generator of the UEs (see generate_resource_grid).
 
     Returns:
         dict: Dictionary containing BER, BLER, and average residual interference energy.
@@ -327,7 +438,7 @@ def run_simulation(simulation_params, ebno_db, batch_size, num_ues):
     is_perfect_CSI = simulation_params["SIC"]["is_perfect_CSI"]
     
     # Generate the resource grids for multiple UEs
-    resource_grids, bits_list, resource_grid_list, channels = generate_resource_grid(simulation_params, batch_size, num_ues)
+    resource_grids, bits_list, resource_grid_list, channels = generate_resource_grid(simulation_params, batch_size, num_ues, rng)
     
     # Pass the resource grids through the AWGN channel
     received_rg, no = pass_through_awgn(resource_grids, ebno_db, simulation_params)
@@ -353,131 +464,357 @@ def run_simulation(simulation_params, ebno_db, batch_size, num_ues):
         "avg_residual_interference": avg_residual_interference
     }
 
+# Two-sided 95% quantile of the standard normal distribution
+CONFIDENCE_Z = 1.959963984540054
+
+def get_wilson_interval(num_errors, num_blocks):
+    """
+    Get the 95% Wilson score confidence interval of an error rate.
+
+    Args:
+        num_errors (int): Number of block errors.
+        num_blocks (int): Number of simulated blocks.
+
+    Returns:
+        tuple: The (low, high) bounds of the confidence interval.
+    """
+    rate = num_errors / num_blocks
+    z2 = CONFIDENCE_Z**2
+    denominator = 1 + z2 / num_blocks
+    center = (rate + z2 / (2 * num_blocks)) / denominator
+    half_width = CONFIDENCE_Z * np.sqrt(rate * (1 - rate) / num_blocks + z2 / (4 * num_blocks**2)) / denominator
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+def run_simulation_adaptive(simulation_params, ebno_db, batch_size, num_ues, target_ci_width=None, max_num_blocks=None, max_num_errors=None, rng=None):
+    """
+    Run batches of the simulation until the 95% confidence interval of the BLER is narrower than the
+    target width, or the maximum number of blocks or of block errors is reached.
+
+    Without a target width and a maximum number of blocks, a single batch is run.
+
+    Args:
+        simulation_params (dict): Dictionary containing all simulation parameters.
+        ebno_db (float): The Eb/No value in dB.
+        batch_size (int): The batch size of every run of the simulation.
+        num_ues (int): The number of UEs in the simulation.
+        target_ci_width (float): Optional target width of the confidence interval of the BLER.
+        max_num_blocks (int): Maximum number of blocks, by default a single batch.
+        max_num_errors (int): Optional maximum number of block errors.
+        rng (tf.random.Generator): Optional generator of the UEs (see generate_resource_grid).
+
+    Returns:
+        dict: Dictionary containing BER, BLER, its confidence interval, average residual interference energy,
+              and the number of simulated blocks and block errors.
+    """
+    if max_num_blocks is None:
+        max_num_blocks = batch_size
+    num_blocks = 0
+    num_errors = 0
+    ber_sum = 0.0
+    residual_interference_sum = 0.0
+    while True:
+        results = run_simulation(simulation_params, ebno_db, batch_size, num_ues, rng)
+
+        num_blocks += batch_size
+        num_errors += int(round(float(results["bler"]) * batch_size))
+        ber_sum += float(results["ber"]) * batch_size
+        residual_interference_sum += float(results["avg_residual_interference"]) * batch_size
+        bler_ci = get_wilson_interval(num_errors, num_blocks)
+
+        if target_ci_width is not None and bler_ci[1] - bler_ci[0] <= target_ci_width:
+            break
+        if num_blocks >= max_num_blocks:
+            break
+        if max_num_errors is not None and num_errors >= max_num_errors:
+            break
+
+    return {
+        "ber": ber_sum / num_blocks,
+        "bler": num_errors / num_blocks,
+        "bler_ci": bler_ci,
+        "avg_residual_interference": residual_interference_sum / num_blocks,
+        "num_blocks": num_blocks,
+        "num_block_errors": num_errors
+    }
+
+def run_sweep_point(point):
+    """
+    Run the simulation of one sweep point.
+
+    Args:
+        point (dict): Dictionary with the simulation_params, ebno_db, batch_size and num_ues of the point, and optionally
+                      its seed and its adaptive stopping parameters (target_ci_width, max_num_blocks, max_num_errors,
+                      see run_simulation_adaptive), in which case batch_size is the number of blocks per batch.
+
+    Returns:
+        dict: Dictionary with the parameters of the point, the number of simulated blocks and its BER, BLER,
+              average residual interference energy and success rate as Python floats, with the 95% confidence
+              intervals of the BLER and of the success rate.
+    """
+    rng = None
+    if point.get("seed") is not None:
+        np.random.seed(point["seed"])
+        tf.random.set_seed(point["seed"])
+        # The UEs (and the codewords drawn from the pool) come from a generator of the point
+        rng = tf.random.Generator.from_seed(point["seed"], alg="philox")
+    results = run_simulation_adaptive(point["simulation_params"], point["ebno_db"], point["batch_size"], point["num_ues"],
+                                      rng=rng, **point.get("adaptive", {}))
+    return {
+        "num_ues": point["num_ues"],
+        "ebno_db": point["ebno_db"],
+        "is_perfect_CSI": point["simulation_params"]["SIC"]["is_perfect_CSI"],
+        "batch_size": point["batch_size"],
+        "num_blocks": results["num_blocks"],
+        "ber": results["ber"],
+        "bler": results["bler"],
+        "bler_ci": list(results["bler_ci"]),
+        "avg_residual_interference": results["avg_residual_interference"],
+        "success_rate": 1 - results["bler"],
+        "success_rate_ci": [1 - results["bler_ci"][1], 1 - results["bler_ci"][0]]
+    }
+
+# Version of the simulation code (the functions defined above) and of the results store, part of the key of
+# the stored results so that editing the simulation invalidates them, while editing the plotting cells does not
+CODE_VERSION = get_code_version(*get_simulation_code(globals()), irsa_results_store)
+
+def save_sweep_results_json(results, file_path):
+    """
+    Save the results of an interferer sweep with the simulation_results_high_ebno.json schema,
+    extended with the confidence intervals and the number of simulated blocks of every point.
+
+    Args:
+        results (list): List of sweep results (see run_sweep_point), in the order of the number of interfered UEs.
+        file_path (str): Path of the JSON file.
+    """
+    results_data = {
+        "num_ues_values": [result["num_ues"] - 1 for result in results],
+        "ber_values_high_ebno": [result["ber"] for result in results],
+        "bler_values_high_ebno": [result["bler"] for result in results],
+        "bler_ci_values_high_ebno": [result["bler_ci"] for result in results],
+        "num_blocks_values_high_ebno": [result["num_blocks"] for result in results],
+        "residual_interference_values_high_ebno": [result["avg_residual_interference"] for result in results],
+        "success_rate_values_high_ebno": [result["success_rate"] for result in results],
+        "success_rate_ci_values_high_ebno": [result["success_rate_ci"] for result in results]
+    }
+    with open(file_path, 'w') as f:
+        json.dump(results_data, f)
+
+def fit_residual_interference_model(results, simulation_params):
+    """
+    Fit the residual-interference model of the SIC from the results of an interferer sweep.
+
+    The model is a table of the residual interference power (the interference plus noise energy per resource
+    element left after the cancellation, minus the noise variance) against the number of cancelled interferers,
+    with the least-squares residual power per cancellation to extrapolate beyond the table, and the decoding
+    threshold: the residual power at which the BLER of the UE crosses 0.5 (infinite if it never does).
+
+    Args:
+        results (list): List of sweep results (see run_sweep_point) at the same Eb/No, in the order of the number of UEs.
+        simulation_params (dict): Dictionary containing all simulation parameters.
+
+    Returns:
+        dict: The residual-interference model.
+    """
+    transport_block_params = simulation_params["Transport block parameters"]
+    ebno_db = results[0]["ebno_db"]
+    no = float(ebnodb2no(ebno_db, num_bits_per_symbol=transport_block_params['num_bits_per_symbol'], coderate=transport_block_params['coderate']))
+
+    num_cancelled = np.array([result["num_ues"] - 1 for result in results], dtype=float)
+    residual_power = np.maximum(np.array([result["avg_residual_interference"] for result in results]) - no, 0)
+    bler = np.array([result["bler"] for result in results])
+
+    # Residual power per cancellation: least-squares slope through the origin
+    residual_power_per_cancellation = float(num_cancelled @ residual_power / max(num_cancelled @ num_cancelled, 1))
+
+    # Residual power at which the BLER crosses 0.5 (the BLER is made non-decreasing in the residual power),
+    # infinite if the BLER never reaches 0.5 over the sweep
+    order = np.argsort(residual_power)
+    sorted_residual_power = residual_power[order]
+    monotone_bler = np.maximum.accumulate(bler[order])
+    if monotone_bler[-1] < 0.5:
+        decoding_threshold = np.inf
+    else:
+        # Interpolate between the two points bracketing the crossing, whose BLERs are strictly increasing
+        crossing = int(np.argmax(monotone_bler >= 0.5))
+        if crossing == 0:
+            decoding_threshold = float(sorted_residual_power[0])
+        else:
+            decoding_threshold = float(np.interp(0.5, monotone_bler[crossing - 1:crossing + 1], sorted_residual_power[crossing - 1:crossing + 1]))
+
+    return {
+        "ebno_db": ebno_db,
+        "noise_variance": no,
+        "is_perfect_CSI": results[0]["is_perfect_CSI"],
+        "num_cancelled_values": num_cancelled.astype(int).tolist(),
+        "residual_power_values": residual_power.tolist(),
+        "residual_power_per_cancellation": residual_power_per_cancellation,
+        "decoding_threshold": decoding_threshold
+    }
+
 #%%
 # Example usage
-simulation_params = {
-    "Carrier parameters": {
-        "num_resource_blocks": 10,
-        "numerology": 0,
-        "pilot_indices": [2,8],
-        "num_ofdm_symbols": 14
-    },
-    "Transport block parameters": {
-        "num_bits_per_symbol": 4,
-        "coderate": 0.5
-    },
-    "SIC": {
-        "is_perfect_CSI": False
-    },
-    "Channel parameters": {
-        "is_phase_shift_applied": True
+if __name__ == "__main__":
+    simulation_params = {
+        "Carrier parameters": {
+            "num_resource_blocks": 10,
+            "numerology": 0,
+            "pilot_indices": [2,8],
+            "num_ofdm_symbols": 14
+        },
+        "Transport block parameters": {
+            "num_bits_per_symbol": 4,
+            "coderate": 0.5
+        },
+        "SIC": {
+            "is_perfect_CSI": False
+        },
+        "Channel parameters": {
+            "is_phase_shift_applied": True
+        }
     }
-}
 
 #%%
 # Run the simulation for a specific Eb/No value, batch size, and number of UEs
-ebno_db = 10
-batch_size = 100
-num_ues = 10
-results = run_simulation(simulation_params, ebno_db, batch_size, num_ues)
-
-# Print the BER, BLER, and average residual interference energy
-print("\n\n")
-print("=====================================================")
-print("Simulation Report:")
-print(f"Eb/No (dB): {ebno_db}")
-print(f"Bit Error Rate (BER) for the first UE: {results['ber']}")
-print(f"Block Error Rate (BLER) for the first UE: {results['bler']}")
-print(f"Average Residual Interference Energy: {results['avg_residual_interference']}")
-print("=====================================================")
+if __name__ == "__main__":
+    ebno_db = 10
+    batch_size = 100
+    num_ues = 10
+    results = run_simulation(simulation_params, ebno_db, batch_size, num_ues)
+
+    # Print the BER, BLER, and average residual interference energy
+    print("\n\n")
+    print("=====================================================")
+    print("Simulation Report:")
+    print(f"Eb/No (dB): {ebno_db}")
+    print(f"Bit Error Rate (BER) for the first UE: {results['ber']}")
+    print(f"Block Error Rate (BLER) for the first UE: {results['bler']}")
+    print(f"Average Residual Interference Energy: {results['avg_residual_interference']}")
+    print("=====================================================")
 
 # %%
 # Plot the BER, BLER, and residual interference energy vs number of interfered UEs for high Eb/No
-high_ebno = 10  # Define a high Eb/No value
-batch_size = 10000
-num_ues_values = range(0, 15)
-
-ber_values_high_ebno = []
-bler_values_high_ebno = []
-residual_interference_values_high_ebno = []
-success_rate_values_high_ebno = []
-
-# Run the simulation for each number of UEs at the high Eb/No value
-for num_ues in num_ues_values:
-    results = run_simulation(simulation_params, high_ebno, batch_size, num_ues+1)
-    ber_values_high_ebno.append(results['ber'])
-    bler_values_high_ebno.append(results['bler'])
-    residual_interference_values_high_ebno.append(results['avg_residual_interference'])
-    success_rate = 1 - results['bler']  # Calculate success rate as 1 - BLER
-    success_rate_values_high_ebno.append(success_rate)
-    print(f"Num UEs: {num_ues}, Eb/No: {high_ebno} dB, BER: {results['ber']}, BLER: {results['bler']}, Residual Interference: {results['avg_residual_interference']}, Success Rate: {success_rate}")
-
-# Plot the BER vs number of interfered UEs
-# Create a directory to save the figures if it doesn't exist
-output_dir = 'simulation_results'
-os.makedirs(output_dir, exist_ok=True)
-
-# Plot the BER vs number of interfered UEs
-plt.figure()
-plt.plot(num_ues_values, ber_values_high_ebno, marker='o')
-plt.xlabel('Number of Interfered UEs')
-plt.ylabel('BER')
-plt.title('BER at Eb/No = 10 dB')
-plt.xticks(num_ues_values)  # Ensure integer ticks for number of UEs
-plt.grid(True)
-plt.savefig(os.path.join(output_dir, 'ber_vs_interfered_ues_high_ebno.png'))
-plt.show()
-
-# Plot the BLER vs number of interfered UEs
-plt.figure()
-plt.plot(num_ues_values, bler_values_high_ebno, marker='o')
-plt.xlabel('Number of Interfered UEs')
-plt.ylabel('BLER')
-plt.title('BLER at Eb/No = 10 dB')
-plt.xticks(num_ues_values)  # Ensure integer ticks for number of UEs
-plt.grid(True)
-plt.savefig(os.path.join(output_dir, 'bler_vs_interfered_ues_high_ebno.png'))
-plt.show()
-
-# Plot the residual interference energy vs number of interfered UEs
-plt.figure()
-plt.plot(num_ues_values, residual_interference_values_high_ebno, marker='o')
-plt.xlabel('Number of Interfered UEs')
-plt.ylabel('SIC error')
-plt.title('Residual Interference Energy')
-plt.xticks(num_ues_values)  # Ensure integer ticks for number of UEs
-plt.grid(True)
-plt.savefig(os.path.join(output_dir, 'residual_interference_vs_interfered_ues_high_ebno.png'))
-plt.show()
-
-# Plot the success rate vs number of interfered UEs
-plt.figure()
-plt.plot(num_ues_values, success_rate_values_high_ebno, marker='o')
-plt.xlabel('Number of Interfered UEs')
-plt.ylabel('Success Rate')
-plt.title('Success Rate vs Interfered UEs')
-plt.xticks(num_ues_values)  # Ensure integer ticks for number of UEs
-plt.grid(True)
-plt.savefig(os.path.join(output_dir, 'success_rate_vs_interfered_ues_high_ebno.png'))
-plt.show()
+if __name__ == "__main__":
+    high_ebno = 10  # Define a high Eb/No value
+    batch_size = 1000
+    # Adaptive stopping: batches are run until the 95% confidence interval of the BLER is narrower than the
+    # target width, capped by a maximum number of blocks and of block errors
+    adaptive = {
+        "target_ci_width": 0.02,
+        "max_num_blocks": 20000,
+        "max_num_errors": 2000
+    }
+    num_ues_values = range(0, 15)
+
+    ber_values_high_ebno = []
+    bler_values_high_ebno = []
+    bler_ci_values_high_ebno = []
+    residual_interference_values_high_ebno = []
+    success_rate_values_high_ebno = []
+
+    # Run the simulation for each number of UEs at the high Eb/No value in parallel worker processes
+    sweep_points = [{
+        "simulation_params": simulation_params,
+        "ebno_db": high_ebno,
+        "batch_size": batch_size,
+        "num_ues": num_ues+1,
+        "adaptive": adaptive,
+        "seed": num_ues
+    } for num_ues in num_ues_values]
+    # Completed points are cached in the store, so restarting or re-plotting the sweep only reads the stored points
+    sweep_results = run_sweep_parallel(run_sweep_point, sweep_points, store_dir=os.path.join('simulation_results', 'sweep_store'), max_store_size=64 * 2**20, code_version=CODE_VERSION)
+
+    for num_ues, results in zip(num_ues_values, sweep_results):
+        ber_values_high_ebno.append(results['ber'])
+        bler_values_high_ebno.append(results['bler'])
+        bler_ci_values_high_ebno.append(results['bler_ci'])
+        residual_interference_values_high_ebno.append(results['avg_residual_interference'])
+        success_rate = results['success_rate']  # Success rate is 1 - BLER
+        success_rate_values_high_ebno.append(success_rate)
+        print(f"Num UEs: {num_ues}, Eb/No: {high_ebno} dB, BER: {results['ber']}, BLER: {results['bler']} (95% CI [{results['bler_ci'][0]:.4f}, {results['bler_ci'][1]:.4f}], {results['num_blocks']} blocks), Residual Interference: {results['avg_residual_interference']}, Success Rate: {success_rate}")
+
+    # Plot the BER vs number of interfered UEs
+    # Create a directory to save the figures if it doesn't exist
+    output_dir = 'simulation_results'
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Plot the BER vs number of interfered UEs
+    plt.figure()
+    plt.plot(num_ues_values, ber_values_high_ebno, marker='o')
+    plt.xlabel('Number of Interfered UEs')
+    plt.ylabel('BER')
+    plt.title('BER at Eb/No = 10 dB')
+    plt.xticks(num_ues_values)  # Ensure integer ticks for number of UEs
+    plt.grid(True)
+    plt.savefig(os.path.join(output_dir, 'ber_vs_interfered_ues_high_ebno.png'))
+    plt.show()
+
+    # Plot the BLER vs number of interfered UEs
+    plt.figure()
+    bler_yerr = np.abs(np.array(bler_ci_values_high_ebno).T - np.array(bler_values_high_ebno))
+    plt.errorbar(num_ues_values, bler_values_high_ebno, yerr=bler_yerr, marker='o', capsize=3)
+    plt.xlabel('Number of Interfered UEs')
+    plt.ylabel('BLER')
+    plt.title('BLER at Eb/No = 10 dB')
+    plt.xticks(num_ues_values)  # Ensure integer ticks for number of UEs
+    plt.grid(True)
+    plt.savefig(os.path.join(output_dir, 'bler_vs_interfered_ues_high_ebno.png'))
+    plt.show()
+
+    # Plot the residual interference energy vs number of interfered UEs
+    plt.figure()
+    plt.plot(num_ues_values, residual_interference_values_high_ebno, marker='o')
+    plt.xlabel('Number of Interfered UEs')
+    plt.ylabel('SIC error')
+    plt.title('Residual Interference Energy')
+    plt.xticks(num_ues_values)  # Ensure integer ticks for number of UEs
+    plt.grid(True)
+    plt.savefig(os.path.join(output_dir, 'residual_interference_vs_interfered_ues_high_ebno.png'))
+    plt.show()
+
+    # Plot the success rate vs number of interfered UEs
+    plt.figure()
+    plt.plot(num_ues_values, success_rate_values_high_ebno, marker='o')
+    plt.xlabel('Number of Interfered UEs')
+    plt.ylabel('Success Rate')
+    plt.title('Success Rate vs Interfered UEs')
+    plt.xticks(num_ues_values)  # Ensure integer ticks for number of UEs
+    plt.grid(True)
+    plt.savefig(os.path.join(output_dir, 'success_rate_vs_interfered_ues_high_ebno.png'))
+    plt.show()
 
 # %%
-import json
 # Save the data to a file
-results_data = {
-    "num_ues_values": num_ues_values.tolist(),
-    "ber_values_high_ebno": ber_values_high_ebno,
-    "bler_values_high_ebno": bler_values_high_ebno,
-    "residual_interference_values_high_ebno": residual_interference_values_high_ebno,
-    "success_rate_values_high_ebno": success_rate_values_high_ebno
-}
-
-# Define the output file path
-output_file_path = os.path.join(output_dir, 'simulation_results_high_ebno.json')
-
-# Save the results to a JSON file
-with open(output_file_path, 'w') as f:
-    json.dump(results_data, f)
-
-print(f"Simulation results saved to {output_file_path}")
+if __name__ == "__main__":
+    # Define the output file path
+    output_file_path = os.path.join(output_dir, 'simulation_results_high_ebno.json')
+
+    # Save the results to a JSON file
+    save_sweep_results_json(sweep_results, output_file_path)
+
+    print(f"Simulation results saved to {output_file_path}")
+
+# %%
+# Fit the residual-interference model of the SIC and save it as a table for the graph-level decoder
+if __name__ == "__main__":
+    residual_model = fit_residual_interference_model(sweep_results, simulation_params)
+    residual_model_path = os.path.join(output_dir, 'residual_interference_model.json')
+    write_json_atomic(residual_model_path, residual_model)
+
+    print(f"Residual power per cancellation: {residual_model['residual_power_per_cancellation']:.4f}, "
+          f"decoding threshold: {residual_model['decoding_threshold']:.4f}")
+    print(f"Residual-interference model saved to {residual_model_path}")
+
+# %%
+# Check the decoding threshold of the residual-interference model on synthetic sweeps
+if __name__ == "__main__":
+    synthetic_results = [{"num_ues": num_ues, "ebno_db": ebno_db, "is_perfect_CSI": False, "avg_residual_interference": 0.1 * num_ues, "bler": bler}
+                         for num_ues, bler in zip(range(1, 6), [0.0, 0.2, 0.2, 0.8, 0.8])]
+    synthetic_model = fit_residual_interference_model(synthetic_results, simulation_params)
+    # The BLER crosses 0.5 halfway between the last point of the 0.2 plateau and the first point of the 0.8 plateau
+    residual_powers = synthetic_model["residual_power_values"]
+    assert np.isclose(synthetic_model["decoding_threshold"], (residual_powers[2] + residual_powers[3]) / 2)
+    # A BLER that never crosses 0.5 gives an infinite threshold, i.e. the residual interference never prevents decoding
+    for result in synthetic_results:
+        result["bler"] = min(result["bler"], 0.3)
+    assert fit_residual_interference_model(synthetic_results, simulation_params)["decoding_threshold"] == np.inf
 # %%
@@ -16,6 +16,15 @@ import matplotlib.pyplot as plt
 
 # for performance measurements
 import time
+import json
+import os
+import csv
+import tempfile
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+
+import irsa_results_store
+from irsa_results_store import get_code_version, get_simulation_code, get_point_fingerprint, write_json_atomic, run_sweep_parallel
 
 # Importing the required classes from the sionna library
 from sionna.mapping import Constellation, Mapper, Demapper
@@ -37,14 +46,172 @@ print('sionna version:', sn.__version__)
 
 #%%
 
-def generate_ues(simulation_params, num_ues_per_frame, num_simulations):
+class SimulationProfiler:
+    """
+    Record the wall time, number of calls and number of processed slots of each stage of a simulation.
+
+    The stages run inside decode_irsa_frame are also broken down per SIC pass (current_pass is set by
+    decode_irsa_frame). Profiling is opt-in: the functions take profiler=None by default, in which case
+    profile_stage returns a shared no-op context manager.
+    """
+    def __init__(self, keep_trace=False):
+        """
+        Args:
+            keep_trace: Boolean indicating whether every stage call is kept to be written as a JSON-lines trace.
+        """
+        self.stats = {}
+        self.pass_stats = {}
+        self.trace = [] if keep_trace else None
+        self.current_pass = None
+
+    @contextmanager
+    def stage(self, name, num_slots=0):
+        """
+        Time a stage of the simulation.
+
+        Args:
+            name: Name of the stage.
+            num_slots: Number of slots processed by the stage.
+        """
+        start_time = time.perf_counter()
+        yield
+        elapsed_time = time.perf_counter() - start_time
+
+        keys = [(self.stats, name)]
+        if self.current_pass is not None:
+            keys.append((self.pass_stats.setdefault(self.current_pass, {}), name))
+        for stats, key in keys:
+            stage_stats = stats.setdefault(key, {"time_s": 0.0, "calls": 0, "slots": 0})
+            stage_stats["time_s"] += elapsed_time
+            stage_stats["calls"] += 1
+            stage_stats["slots"] += int(num_slots)
+
+        if self.trace is not None:
+            self.trace.append({"stage": name, "pass": self.current_pass, "time_s": elapsed_time, "slots": int(num_slots)})
+
+    def report(self):
+        """
+        Get the recorded statistics.
+
+        Returns:
+            report: Dictionary with the time, calls, slots and slots per second of each stage,
+                    in total ("stages") and for each SIC pass ("passes").
+        """
+        def with_throughput(stats):
+            return {name: dict(stage_stats, slots_per_s=stage_stats["slots"] / stage_stats["time_s"] if stage_stats["time_s"] > 0 else 0.0)
+                    for name, stage_stats in stats.items()}
+
+        return {
+            "stages": with_throughput(self.stats),
+            "passes": {pass_num: with_throughput(stats) for pass_num, stats in self.pass_stats.items()}
+        }
+
+    def write_trace(self, file_path):
+        """
+        Write the recorded stage calls to a JSON-lines file.
+
+        Args:
+            file_path: Path of the trace file.
+        """
+        with open(file_path, 'w') as file:
+            for event in self.trace:
+                file.write(json.dumps(event) + '\n')
+
+# Shared no-op context manager used when profiling is disabled
+NO_PROFILING = nullcontext()
+
+def profile_stage(profiler, name, num_slots=0):
+    """
+    Get the context manager timing a stage, or a no-op one when profiling is disabled.
+
+    Args:
+        profiler: SimulationProfiler instance, or None to disable profiling.
+        name: Name of the stage.
+        num_slots: Number of slots processed by the stage.
+
+    Returns:
+        context: The context manager to run the stage in.
+    """
+    if profiler is None:
+        return NO_PROFILING
+    return profiler.stage(name, num_slots)
+
+# Branches of the seed tree: the simulated frames, the codeword pool and the BLER tables
+RNG_BRANCHES = ("simulation", "codeword_pool", "bler_table")
+
+# Components drawing random numbers, each from its own stream
+RNG_COMPONENTS = ("slots", "codewords", "bits", "channel", "noise", "decoding")
+
+# Components drawing their random numbers with TensorFlow, the others draw them with NumPy
+TF_RNG_COMPONENTS = ("bits", "channel", "noise")
+
+def get_rng_streams(seed, chunk_index=0, branch="simulation"):
+    """
+    Derive the random streams of one chunk of frames from the seed tree.
+
+    The seed of the sweep point is the root of the tree and every (branch, chunk, component) gets its own
+    leaf np.random.SeedSequence, from which a counter-based Philox generator is built. The streams are
+    therefore independent and any chunk can be regenerated on its own, on any worker.
+
+    Args:
+        seed: Seed of the sweep point, an integer or a list of integers (e.g. [sweep_seed, point_index]).
+        chunk_index: Index of the chunk of frames of the point.
+        branch: Branch of the seed tree (see RNG_BRANCHES).
+
+    Returns:
+        rng_streams: Dictionary mapping every component of RNG_COMPONENTS to its generator, a tf.random.Generator
+                     for the components of TF_RNG_COMPONENTS and a np.random.Generator for the others.
+    """
+    rng_streams = {}
+    for component_index, component in enumerate(RNG_COMPONENTS):
+        seed_sequence = np.random.SeedSequence(seed, spawn_key=(RNG_BRANCHES.index(branch), chunk_index, component_index))
+        if component in TF_RNG_COMPONENTS:
+            tf_seed = int(seed_sequence.generate_state(1, dtype=np.uint64)[0] >> np.uint64(1))
+            rng_streams[component] = tf.random.Generator.from_seed(tf_seed, alg="philox")
+        else:
+            rng_streams[component] = np.random.Generator(np.random.Philox(seed_sequence))
+    return rng_streams
+
+def get_ue_id_header(ue_ids, num_ue_id_bits):
+    """
+    Get the header bits carrying the index of each UE in its frame, most significant bit first.
+
+    Args:
+        ue_ids: Array of the indices of the UEs in their frames.
+        num_ue_id_bits: Number of bits of the header.
+
+    Returns:
+        header_bits: Array of shape (len(ue_ids), num_ue_id_bits) with the float32 header bits.
+    """
+    return ((np.asarray(ue_ids)[:, np.newaxis] >> np.arange(num_ue_id_bits - 1, -1, -1)) & 1).astype(np.float32)
+
+def read_ue_id_header(header_bits):
+    """
+    Read the indices of the UEs in their frames from the header bits (see get_ue_id_header).
+
+    Args:
+        header_bits: Array of shape (num_blocks, num_ue_id_bits) with the header bits.
+
+    Returns:
+        ue_ids: Array of the indices of the UEs in their frames.
+    """
+    num_ue_id_bits = header_bits.shape[1]
+    return np.asarray(header_bits).astype(np.int64) @ (1 << np.arange(num_ue_id_bits - 1, -1, -1))
+
+def generate_ues(simulation_params, num_ues_per_frame, num_simulations, rng_streams=None):
     """
     Create the UE resource grid to be transmitted and the indices of the replicas for one UE.
 
+    When a crc_polynomial (e.g. "CRC16" or "CRC24A") is set in the transport block parameters, every
+    transport block is made of a header carrying the index of the UE in its frame (num_ue_id_bits bits,
+    16 by default), the random payload and the CRC, so that the receiver can identify the UEs without the
+    transmitted bits (see search_new_identified_ues_crc).
+
     Args:
         simulation_params: Dictionary containing all simulation parameters.
         num_ues_per_frame: Number of UEs in the frame.
         num_simulations: Number of simulations to run.
+        rng_streams: Optional random streams (see get_rng_streams), by default the global generators are used.
 
     Returns:
         resource_grids: List of resource grids for each UE.
@@ -61,6 +228,24 @@ def generate_ues(simulation_params, num_ues_per_frame, num_simulations):
     transport_block_params = simulation_params["Transport block parameters"]
     num_bits_per_symbol = transport_block_params['num_bits_per_symbol']
     coderate = transport_block_params['coderate']
+    codeword_pool_size = transport_block_params.get('codeword_pool_size')
+    crc_polynomial = transport_block_params.get('crc_polynomial')
+    num_ue_id_bits = transport_block_params.get('num_ue_id_bits', 16)
+
+    if crc_polynomial and num_ues_per_frame > 2 ** num_ue_id_bits:
+        raise ValueError(f"{num_ues_per_frame} UEs per frame cannot be identified with a {num_ue_id_bits} bits header")
+
+    # Draw the codewords of the UEs with replacement from the pre-encoded pool if enabled
+    if codeword_pool_size:
+        if crc_polynomial:
+            raise ValueError("The CRC identification mode needs the index of the UE in every transport block and cannot be used with the codeword pool")
+        codeword_pool = get_codeword_pool(simulation_params)
+        num_ues = num_ues_per_frame * num_simulations
+        if rng_streams is None:
+            codeword_ids = np.random.randint(codeword_pool_size, size=num_ues)
+        else:
+            codeword_ids = rng_streams["codewords"].integers(codeword_pool_size, size=num_ues)
+        return tf.gather(codeword_pool["resource_grids"], codeword_ids), tf.gather(codeword_pool["bits"], codeword_ids)
 
     # Object creations
     # Create the needed objects for transmission
@@ -95,9 +280,27 @@ def generate_ues(simulation_params, num_ues_per_frame, num_simulations):
     # Transmission
     
     
+    # With a CRC, the random payload is what is left of the transport block after the header and the CRC
+    num_payload_bits = k
+    if crc_polynomial:
+        crc_encoder = sn.fec.crc.CRCEncoder(crc_polynomial)
+        num_payload_bits = k - num_ue_id_bits - crc_encoder.crc_length
+        if num_payload_bits <= 0:
+            raise ValueError(f"A transport block of {k} bits (num_bits_per_symbol={num_bits_per_symbol}, coderate={coderate}, "
+                             f"num_resource_blocks={num_resource_blocks}) leaves no payload after the {num_ue_id_bits} bits header "
+                             f"(num_ue_id_bits) and the {crc_encoder.crc_length} bits CRC (crc_polynomial={crc_polynomial})")
+
     # Generate random binary bits for the UE
     num_ues =num_ues_per_frame* num_simulations
-    bits = binary_source([num_ues, k])
+    if rng_streams is None:
+        bits = binary_source([num_ues, num_payload_bits])
+    else:
+        bits = tf.cast(rng_streams["bits"].uniform([num_ues, num_payload_bits], minval=0, maxval=2, dtype=tf.int32), tf.float32)
+
+    # Prepend the header with the index of the UE in its frame and append the CRC
+    if crc_polynomial:
+        header_bits = get_ue_id_header(np.arange(num_ues) % num_ues_per_frame, num_ue_id_bits)
+        bits = crc_encoder(tf.concat([header_bits, bits], axis=1))
     
     # Encode the bits using LDPC encoder
     codewords = encoder(bits)
@@ -113,140 +316,271 @@ def generate_ues(simulation_params, num_ues_per_frame, num_simulations):
     
     return resource_grid, bits
 
-def generate_slot_indices(num_simulations, num_ues_per_frame, frame_size, probabilities):
+# Pre-encoded codeword pools built so far, keyed on the carrier and transport block parameters
+codeword_pool_cache = {}
+
+def get_codeword_pool(simulation_params):
+    """
+    Get the pool of pre-encoded codewords for the given simulation parameters.
+
+    The codeword_pool_size codewords of the pool are drawn, LDPC encoded, mapped and placed on the resource
+    grid only once per configuration, so generating the UEs reduces to a gather from the pool. Since
+    identification compares the decoded bits with the bits of the UEs, the pool should be much larger than
+    the number of UEs per frame so that UEs sharing a codeword in a frame stay rare.
+
+    Args:
+        simulation_params: Dictionary containing all simulation parameters, with the codeword_pool_size
+                           (and optionally the codeword_pool_seed) in the transport block parameters.
+
+    Returns:
+        codeword_pool: Dictionary containing the resource grids and the bits of the codewords of the pool.
+    """
+    carrier_params = simulation_params["Carrier parameters"]
+    transport_block_params = simulation_params["Transport block parameters"]
+    codeword_pool_size = transport_block_params['codeword_pool_size']
+    codeword_pool_seed = transport_block_params.get('codeword_pool_seed', 0)
+
+    # The pool depends on everything generate_ues reads, including its seed
+    key = (carrier_params['numerology'], carrier_params['num_resource_blocks'], carrier_params['num_ofdm_symbols'],
+           tuple(carrier_params['pilot_indices']), transport_block_params['num_bits_per_symbol'],
+           transport_block_params['coderate'], transport_block_params.get('crc_polynomial'), transport_block_params.get('num_ue_id_bits', 16),
+           codeword_pool_size, codeword_pool_seed)
+
+    if key not in codeword_pool_cache:
+        # Encode the codewords of the pool as the UEs of a single frame, drawn from the codeword pool branch
+        # of the seed tree so that all the workers build the same pool
+        pool_params = dict(simulation_params, **{"Transport block parameters": dict(transport_block_params, codeword_pool_size=None)})
+        rng_streams = get_rng_streams(codeword_pool_seed, branch="codeword_pool")
+        resource_grids, bits = generate_ues(pool_params, codeword_pool_size, 1, rng_streams)
+        codeword_pool_cache[key] = {"resource_grids": resource_grids, "bits": bits}
+
+    return codeword_pool_cache[key]
+
+def get_row_positions(row_splits, rows):
+    """
+    Get the positions of the elements of the given rows of a CSR layout.
+
+    Args:
+        row_splits: Row splits of the layout, the elements of row i being at the positions row_splits[i]:row_splits[i+1].
+        rows: Array of row indices.
+
+    Returns:
+        positions: Flat array of the positions of the elements of the rows, row after row.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    starts = row_splits[rows].astype(np.int64)
+    counts = row_splits[rows + 1] - starts
+    offsets = np.cumsum(counts) - counts
+    return np.repeat(starts - offsets, counts) + np.arange(counts.sum())
+
+class ReplicaMap:
+    """
+    Struct-of-arrays map between the UEs of a hyper frame and the slots of their replicas.
+
+    The replicas are stored UE after UE in flat int32 arrays holding the slot, the owner UE and the ordinal
+    (rank among the replicas of its UE) of every replica. The replicas of UE i are at the positions
+    row_splits[i]:row_splits[i+1], and the inverse index lists the replicas of every slot: the replicas in
+    slot s are at the positions slot_replicas[slot_row_splits[s]:slot_row_splits[s+1]], in UE order.
+    Both the slots of a UE and the UEs of a slot are therefore found without scanning all the replicas.
+    """
+
+    def __init__(self, slot_ids, replica_counts, num_slots):
+        """
+        Build the map from the slots of all the replicas.
+
+        Args:
+            slot_ids: Flat array of the slot indices of all the replicas, UE after UE.
+            replica_counts: Array of shape (num_ues,) with the number of replicas of each UE.
+            num_slots: Total number of slots in the hyper frame.
+        """
+        replica_counts = np.asarray(replica_counts, dtype=np.int32)
+        self.num_slots = num_slots
+        self.slot_ids = np.asarray(slot_ids, dtype=np.int32)
+        self.row_splits = np.zeros(len(replica_counts) + 1, dtype=np.int32)
+        np.cumsum(replica_counts, out=self.row_splits[1:])
+        self.ue_ids = np.repeat(np.arange(len(replica_counts), dtype=np.int32), replica_counts)
+        self.ordinals = np.arange(len(self.slot_ids), dtype=np.int32) - np.repeat(self.row_splits[:-1], replica_counts)
+
+        # Inverse index: the replicas sorted by slot, in UE order inside a slot
+        self.slot_replicas = np.argsort(self.slot_ids, kind="stable").astype(np.int32)
+        self.slot_row_splits = np.zeros(num_slots + 1, dtype=np.int32)
+        np.cumsum(np.bincount(self.slot_ids, minlength=num_slots), out=self.slot_row_splits[1:])
+
+    @property
+    def num_ues(self):
+        return len(self.row_splits) - 1
+
+    @property
+    def num_replicas(self):
+        return len(self.slot_ids)
+
+    @property
+    def replica_counts(self):
+        return np.diff(self.row_splits)
+
+    @property
+    def slot_counts(self):
+        return np.diff(self.slot_row_splits)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.slot_ids, self.ue_ids, self.ordinals, self.row_splits, self.slot_replicas, self.slot_row_splits))
+
+    def get_replica_positions(self, ues):
+        """
+        Get the positions of the replicas of the given UEs in the flat replica arrays, UE after UE.
+        """
+        return get_row_positions(self.row_splits, ues)
+
+    def get_slots(self, ues):
+        """
+        Get the slots of the replicas of the given UEs, UE after UE.
+        """
+        return self.slot_ids[self.get_replica_positions(ues)]
+
+    def get_slot_replica_positions(self, slots):
+        """
+        Get the positions of the replicas in the given slots in the flat replica arrays, slot after slot.
+        """
+        return self.slot_replicas[get_row_positions(self.slot_row_splits, slots)]
+
+    def get_ues(self, slots):
+        """
+        Get the UEs with a replica in the given slots, slot after slot.
+        """
+        return self.ue_ids[self.get_slot_replica_positions(slots)]
+
+def generate_slot_indices(num_simulations, num_ues_per_frame, frame_size, probabilities, rng=None):
     """
     Generate slot indices for each UE based on the given probabilities.
 
+    The number of replicas of all the UEs is drawn at once, and the distinct slots of all the UEs are
+    drawn with a single argsort over a (num_ues, frame_size) uniform matrix (each row is a random
+    permutation of the slots of the frame, of which the first num_replicas are kept).
+
     Args:
-        simulation_num: Number of simulations to run.
+        num_simulations: Number of simulations to run.
         num_ues_per_frame: Number of UEs per frame.
         frame_size: Total number of slots in the frame.
         probabilities: Probabilities for selecting number of replicas.
+        rng: Optional np.random.Generator, by default the global NumPy generator is used.
 
     Returns:
-        slot_indices_tensor: Tensor of shape (batch_size, ) where batch_size = simulation_num * num_ues_per_frame.
-                                Each element is a list of the replicas.
-        replica_counts: List of the number of replicas for each UE.
+        replica_map: ReplicaMap of the slots of the replicas of all the UEs.
     """
-
     num_ues = num_simulations * num_ues_per_frame
-    
-    slot_indices_list = []
+    if rng is None:
+        rng = np.random
 
     # Step 1: Randomly select the number of replicas for each UE based on the given probabilities
-    replica_counts = np.random.choice(np.arange(len(probabilities)), size=num_ues, p=probabilities)
+    replica_counts = rng.choice(np.arange(len(probabilities)), size=num_ues, p=probabilities)
 
-    # Step 2: For each UE, randomly select slot indices based on the selected number of replicas
-    for i in range(num_simulations):
-        for j in range(num_ues_per_frame):
-            num_replicas = replica_counts[i * num_ues_per_frame + j]
-            slot_indices = np.random.choice(np.arange(i * frame_size, (i + 1) * frame_size), size=num_replicas, replace=False)
-            slot_indices_list.append(slot_indices)
-    
+    # Step 2: Draw a random permutation of the slots of its frame for each UE
+    slot_permutations = rng.uniform(size=(num_ues, frame_size)).argsort(axis=1)
+    frame_offsets = (np.arange(num_ues) // num_ues_per_frame) * frame_size
+
+    # Step 3: Keep the first slots of each permutation according to the number of replicas
+    is_selected = np.arange(frame_size) < replica_counts[:, np.newaxis]
+    slot_indices = (slot_permutations + frame_offsets[:, np.newaxis])[is_selected]
 
-    return slot_indices_list, replica_counts
+    return ReplicaMap(slot_indices, replica_counts, num_simulations * frame_size)
 
-def generate_channel(simulation_params, num_simulations, num_ues_per_frame, num_replicas, is_phase_shift_applied):
+def generate_channel(simulation_params, num_simulations, num_ues_per_frame, replica_map, is_phase_shift_applied, rng=None):
     """
-    Generate the same channel coefficients for all resource elements in the resource grid for each UE.
+    Generate one channel coefficient per replica of each UE.
+
+    The coefficient is the same for all resource elements of the replica, so only one complex value is
+    stored per replica and it is broadcast over the resource grid when the channel is applied.
     
     Args:
         simulation_params: Dictionary containing all simulation parameters.
         num_ues_per_frame: Number of UEs per frame.
         num_simulations: Number of simulations to run.
-        num_replicas: Array of number of replicas for each UE.
+        replica_map: ReplicaMap of the replicas of the UEs.
         is_phase_shift_applied: Boolean indicating whether phase shift should be applied.
+        rng: Optional tf.random.Generator, by default the global TensorFlow generator is used.
         
     Returns:
-        angles: The angles used for phase shift as a tf.RaggedTensor.
-        channel_coeff: The channel coefficients as a tf.RaggedTensor, where each element is a 3D tensor.
+        angles: The angles used for phase shift as a tf.RaggedTensor of shape (num_ues, (num_replicas)).
+        channel_coeff: The channel coefficients as a tf.RaggedTensor of shape (num_ues, (num_replicas)),
+                       i.e. a flat (total_replicas,) complex vector with the row splits of the UEs.
     """
-    carrier_params = simulation_params["Carrier parameters"]
-    num_ofdm_symbols = carrier_params['num_ofdm_symbols']  # Number of OFDM symbols in a frame
-    num_resource_blocks = carrier_params['num_resource_blocks']  # Number of resource blocks
-    fft_size = 12 * num_resource_blocks  # Total number of subcarriers (assuming 12 subcarriers per resource block)
-
-    num_ues = num_ues_per_frame * num_simulations
-    
-    angles_list = []
-    channel_coeff_list = []
+    total_replicas = replica_map.num_replicas
     
-    for ue_idx in range(num_ues):
-        # Number of replicas for the current UE
-        ue_num_replicas = num_replicas[ue_idx]
+    if is_phase_shift_applied:
+        # Step 1: Create a set of angles for all the replicas
+        uniform = tf.random.uniform if rng is None else rng.uniform
+        angles = 2 * np.pi * uniform(shape=[total_replicas], minval=0, maxval=1, dtype=tf.float32)
         
-        if is_phase_shift_applied:
-            # Step 1: Create a set of angles for the current UE
-            angles = 2 * np.pi * tf.random.uniform(shape=[ue_num_replicas], minval=0, maxval=1, dtype=tf.float32)
-            
-            # Step 2: Calculate the channel coefficient for the current UE
-            channel_coeff_single = tf.complex(tf.cos(angles), tf.sin(angles))
-        else:
-            # No phase shift, return zeros for angles and ones for channel coefficients
-            angles = tf.zeros([ue_num_replicas], dtype=tf.float32)
-            channel_coeff_single = tf.ones([ue_num_replicas], dtype=tf.complex64)
+        # Step 2: Calculate the channel coefficient of each replica
+        channel_coeff = tf.complex(tf.cos(angles), tf.sin(angles))
+    else:
+        # No phase shift, return zeros for angles and ones for channel coefficients
+        angles = tf.zeros([total_replicas], dtype=tf.float32)
+        channel_coeff = tf.ones([total_replicas], dtype=tf.complex64)
 
-        # Step 3: Replicate the channel coefficient across all resource elements (OFDM symbols × subcarriers)
-        channel_coeff = tf.tile(tf.expand_dims(tf.expand_dims(channel_coeff_single, -1), -1), 
-                                multiples=[1, num_ofdm_symbols, fft_size])
+    # Step 3: Split the replicas between the UEs
+    angles = tf.RaggedTensor.from_row_splits(angles, replica_map.row_splits, validate=False)
+    channel_coeff = tf.RaggedTensor.from_row_splits(channel_coeff, replica_map.row_splits, validate=False)
 
-        # Append the results to the lists
-        angles_list.append(angles)
-        channel_coeff_list.append(channel_coeff)
+    return angles, channel_coeff
 
-    return angles_list, channel_coeff_list
 
-
-def generate_hyper_irsa_frame(simulation_params, num_simulations, num_ues_per_frame, frame_size, probabilities):
+def build_hyper_irsa_frame(resource_grids, channel_coeff, replica_map, batch_size):
     """
-    Generate an IRSA frame based on the given simulation parameters.
+    Build the hyper IRSA frame in a single shot from all the (UE, replica, slot) triples.
+
+    All the replicas are gathered into one index tensor and added to the frame with a single
+    tf.tensor_scatter_nd_add. The replicas are ordered UE by UE, so the slots where several UEs
+    collide are summed in the same order as in build_hyper_irsa_frame_per_ue.
 
     Args:
-        simulation_params: Dictionary containing all simulation parameters.
-        num_simulations: Number of simulations to run.
-        num_ues_per_frame: Number of UEs per frame.
-        frame_size: Total number of slots in the frame.
-        probabilities: Probabilities for selecting 1, 2, 3, or 4 replicas.
+        resource_grids: Tensor of shape (num_ues, num_ofdm_symbols, fft_size) with the resource grid of each UE.
+        channel_coeff: The channel coefficient of each replica as a tf.RaggedTensor of shape (num_ues, (num_replicas)).
+        replica_map: ReplicaMap of the replicas of the UEs.
+        batch_size: Total number of slots in the hyper frame (num_simulations * frame_size).
 
     Returns:
-        irsa_frame: The generated IRSA frame.
-        resource_grid_list: List of resource grids for each UE.
-        h_ues: Channel coefficients for each UE in each slot.
-        replicas_indices_list: List of replica indices for each UE.
-        original_bits_list: List of original bits for each UE.
+        irsa_hyper_frame: The generated hyper IRSA frame.
     """
-    # Extract necessary parameters from the simulation_params dictionary
-    carrier_params = simulation_params["Carrier parameters"]
-    num_ofdm_symbols = carrier_params['num_ofdm_symbols']
-    num_resource_blocks = carrier_params['num_resource_blocks']
-    fft_size = 12 * num_resource_blocks
-
-    channel_params = simulation_params["Channel parameters"]
-    is_phase_shift_applied = channel_params['is_phase_shift_applied']
-    
-    # Create the output frame tensor
-    batch_size = num_simulations * frame_size
+    num_ofdm_symbols = resource_grids.shape[1]
+    fft_size = resource_grids.shape[2]
     irsa_hyper_frame = tf.zeros([batch_size, num_ofdm_symbols, fft_size], dtype=tf.complex64)
-    
-    # Lists to store the resource grids, replica indices, and original bits for each UE
-    resource_grids, bits = generate_ues(simulation_params, num_ues_per_frame, num_simulations)
-    
-    # Generate slot indices based on the given probabilities
-    slot_indices, num_replicas = generate_slot_indices(num_simulations, num_ues_per_frame, frame_size, probabilities)
-    
-    # Generate the channel coefficients for each UE
-    angles, channel_coeff = generate_channel(simulation_params, num_simulations, num_ues_per_frame, num_replicas, is_phase_shift_applied)
-    
 
-    
-    # Create an empty tensor to store the hyper IRSA frame
+    # The (UE, replica, slot) triples are the flat arrays of the replica map
+    ue_ids = replica_map.ue_ids
+    if len(ue_ids) == 0:
+        return irsa_hyper_frame
+    replica_slots = replica_map.slot_ids
+
+    # Apply the channel of each replica to the resource grid of its UE
+    replica_channels = channel_coeff.values[:, tf.newaxis, tf.newaxis]
+    replica_grids = tf.gather(resource_grids, ue_ids) * replica_channels
+
+    # Add all the replicas to the frame at once
+    irsa_hyper_frame = tf.tensor_scatter_nd_add(irsa_hyper_frame, replica_slots[:, np.newaxis], replica_grids)
+
+    return irsa_hyper_frame
+
+def build_hyper_irsa_frame_per_ue(resource_grids, channel_coeff, replica_map, batch_size):
+    """
+    Build the hyper IRSA frame UE by UE (reference implementation of build_hyper_irsa_frame).
+
+    Args:
+        resource_grids: Tensor of shape (num_ues, num_ofdm_symbols, fft_size) with the resource grid of each UE.
+        channel_coeff: The channel coefficient of each replica as a tf.RaggedTensor of shape (num_ues, (num_replicas)).
+        replica_map: ReplicaMap of the replicas of the UEs.
+        batch_size: Total number of slots in the hyper frame (num_simulations * frame_size).
+
+    Returns:
+        irsa_hyper_frame: The generated hyper IRSA frame.
+    """
+    num_ofdm_symbols = resource_grids.shape[1]
+    fft_size = resource_grids.shape[2]
     irsa_hyper_frame = tf.zeros([batch_size, num_ofdm_symbols, fft_size], dtype=tf.complex64)
-    
-    
-    num_ues=num_ues_per_frame*num_simulations
-    
+
     # Process each UE
-    for ue_index in range(num_ues):
+    for ue_index in range(replica_map.num_ues):
         # Create a temporary hyper IRSA frame for the current UE
         ue_hyper_irsa_frame = tf.zeros_like(irsa_hyper_frame)
         
@@ -255,8 +589,8 @@ def generate_hyper_irsa_frame(simulation_params, num_simulations, num_ues_per_fr
         channel_coeff_ue = channel_coeff[ue_index]
         
         # Get the slot indices for the current UE
-        slot_indices_ue = slot_indices[ue_index]
-        num_replicas_ue = num_replicas[ue_index]
+        slot_indices_ue = replica_map.get_slots([ue_index])
+        num_replicas_ue = len(slot_indices_ue)
         
         # Allocate the replicas of the current UE in the temporary hyper IRSA frame
         for replica_index in range(num_replicas_ue):
@@ -266,12 +600,93 @@ def generate_hyper_irsa_frame(simulation_params, num_simulations, num_ues_per_fr
         
         # Add the temporary hyper IRSA frame to the output frame
         irsa_hyper_frame += ue_hyper_irsa_frame
+
+    return irsa_hyper_frame
+
+def generate_hyper_irsa_frame(simulation_params, num_simulations, num_ues_per_frame, frame_size, probabilities, rng_streams=None):
+    """
+    Generate an IRSA frame based on the given simulation parameters.
+
+    Args:
+        simulation_params: Dictionary containing all simulation parameters.
+        num_simulations: Number of simulations to run.
+        num_ues_per_frame: Number of UEs per frame.
+        frame_size: Total number of slots in the frame.
+        probabilities: Probabilities for selecting 1, 2, 3, or 4 replicas.
+        rng_streams: Optional random streams (see get_rng_streams), by default the global generators are used.
+
+    Returns:
+        irsa_frame: The generated IRSA frame.
+        resource_grids: Resource grids for each UE.
+        h_ues: Channel coefficient of each replica of each UE.
+        replica_map: ReplicaMap of the replicas of the UEs.
+        bits: Original bits for each UE.
+    """
+    channel_params = simulation_params["Channel parameters"]
+    is_phase_shift_applied = channel_params['is_phase_shift_applied']
+    
+    batch_size = num_simulations * frame_size
+    
+    # Lists to store the resource grids, replica indices, and original bits for each UE
+    resource_grids, bits = generate_ues(simulation_params, num_ues_per_frame, num_simulations, rng_streams)
+    
+    # Generate slot indices based on the given probabilities
+    replica_map = generate_slot_indices(num_simulations, num_ues_per_frame, frame_size, probabilities, rng_streams and rng_streams["slots"])
+    
+    # Generate the channel coefficients for each UE
+    angles, channel_coeff = generate_channel(simulation_params, num_simulations, num_ues_per_frame, replica_map, is_phase_shift_applied, rng_streams and rng_streams["channel"])
+    
+    # Allocate the replicas of all the UEs in the hyper IRSA frame
+    irsa_hyper_frame = build_hyper_irsa_frame(resource_grids, channel_coeff, replica_map, batch_size)
         
-    return irsa_hyper_frame, resource_grids, channel_coeff, slot_indices,num_replicas, bits
+    return irsa_hyper_frame, resource_grids, channel_coeff, replica_map, bits
+
+def generate_hyper_irsa_frame_chunks(simulation_params, num_simulations, num_ues_per_frame, frame_size, probabilities, chunk_num_simulations, seed=None, first_chunk_index=0):
+    """
+    Generate the IRSA frames of the simulations in chunks of independent frames.
+
+    Only one chunk is built at a time, so the memory used by the frames does not depend on num_simulations.
+
+    Args:
+        simulation_params: Dictionary containing all simulation parameters.
+        num_simulations: Number of simulations to run.
+        num_ues_per_frame: Number of UEs per frame.
+        frame_size: Total number of slots in the frame.
+        probabilities: Probabilities for selecting 1, 2, 3, or 4 replicas.
+        chunk_num_simulations: Number of frames per chunk.
+        seed: Optional seed of the point, the chunk i is then drawn from the streams get_rng_streams(seed, first_chunk_index + i).
+        first_chunk_index: Index of the first chunk in the seed tree.
 
+    Yields:
+        chunk_num_simulations: Number of frames of the chunk (the last chunk may be smaller).
+        chunk: The hyper IRSA frame of the chunk and its UEs (see generate_hyper_irsa_frame).
+    """
+    for chunk_index, first_simulation in enumerate(range(0, num_simulations, chunk_num_simulations), start=first_chunk_index):
+        num_chunk_simulations = min(chunk_num_simulations, num_simulations - first_simulation)
+        rng_streams = get_rng_streams(seed, chunk_index) if seed is not None else None
+        yield num_chunk_simulations, generate_hyper_irsa_frame(simulation_params, num_chunk_simulations, num_ues_per_frame, frame_size, probabilities, rng_streams)
 
                 
-def pass_through_awgn(irsa_frame, ebno_db, simulation_params):
+def add_awgn(irsa_frame, no, rng=None):
+    """
+    Add complex white Gaussian noise of variance no to a frame.
+
+    Args:
+        irsa_frame: The frame to be transmitted.
+        no: The noise variance.
+        rng: Optional tf.random.Generator drawing the noise, by default the sionna AWGN channel is used.
+
+    Returns:
+        received_frame: The frame with the noise added.
+    """
+    if rng is None:
+        return sn.channel.AWGN()([irsa_frame, no])
+    # Each of the real and imaginary parts of the noise has half of the variance
+    noise_stddev = tf.complex(tf.sqrt(tf.cast(no, tf.float32) / 2), 0.0)
+    noise = tf.complex(rng.normal(tf.shape(irsa_frame)), rng.normal(tf.shape(irsa_frame)))
+    return irsa_frame + noise_stddev * noise
+
+def pass_through_awgn(irsa_frame, ebno_db, simulation_params, rng=None):
     """
     Pass an IRSA frame through an AWGN channel.
 
@@ -279,6 +694,7 @@ def pass_through_awgn(irsa_frame, ebno_db, simulation_params):
         irsa_frame: The IRSA frame to be transmitted.
         ebno_db: The Eb/No value in dB.
         simulation_params: Dictionary containing all simulation parameters.
+        rng: Optional tf.random.Generator drawing the noise, by default the global TensorFlow generator is used.
 
     Returns:
         y_combined: The received signal after passing through the AWGN channel.
@@ -289,29 +705,38 @@ def pass_through_awgn(irsa_frame, ebno_db, simulation_params):
     num_bits_per_symbol = transport_block_params['num_bits_per_symbol']
     coderate = transport_block_params['coderate']
 
-    # Create an instance of the AWGN channel
-    awgn_channel = sn.channel.AWGN()
-
     # Calculate the noise variance
     no = sn.utils.ebnodb2no(ebno_db, num_bits_per_symbol=num_bits_per_symbol, coderate=coderate)
 
     # Pass the IRSA frame through the AWGN channel
-    received_frame = awgn_channel([irsa_frame, no])
+    received_frame = add_awgn(irsa_frame, no, rng)
 
     return received_frame, no
 
-def decode_frame(received_rg, no, num_simulations, frame_size, simulation_params):
+# Maximum number of receiver chains kept in the cache
+RECEIVER_CHAIN_CACHE_SIZE = 8
+
+# Receiver chains built so far, ordered from the least to the most recently used
+receiver_chain_cache = OrderedDict()
+
+# Number of cache hits and misses
+receiver_chain_cache_stats = {"hits": 0, "misses": 0}
+
+def get_receiver_chain(simulation_params):
     """
-    Decode a single slot and output the estimated bits and channel coefficients.
+    Get the receiver chain objects for the given simulation parameters.
+
+    The chain is cached with LRU eviction and keyed on the carrier and transport block parameters,
+    so the LDPC graph and the channel estimator are built only once per configuration.
 
     Args:
-        received_rg: The received resource grid for the slot.
-        no: The noise variance.
         simulation_params: Dictionary containing all simulation parameters.
 
     Returns:
-        bits_hat: The estimated bits.
-        h_hat: The estimated channel coefficients.
+        receiver_chain: Dictionary containing the resource grid, demapper, encoder, decoder,
+                        LS channel estimator, the indices of the data OFDM symbols, the CRC decoder
+                        (None without crc_polynomial), and the mapper and resource grid mapper
+                        re-encoding the decoded transport blocks (see reencode_transport_blocks).
     """
     # Extract necessary parameters from the simulation_params dictionary
     carrier_params = simulation_params["Carrier parameters"]
@@ -319,14 +744,21 @@ def decode_frame(received_rg, no, num_simulations, frame_size, simulation_params
     num_resource_blocks = carrier_params['num_resource_blocks']
     num_ofdm_symbols = carrier_params['num_ofdm_symbols']
     pilot_indices = carrier_params['pilot_indices']
-    data_indices = np.setdiff1d(np.arange(num_ofdm_symbols), pilot_indices)
 
     transport_block_params = simulation_params["Transport block parameters"]
     num_bits_per_symbol = transport_block_params['num_bits_per_symbol']
     coderate = transport_block_params['coderate']
+    crc_polynomial = transport_block_params.get('crc_polynomial')
+
+    key = (numerology, num_resource_blocks, num_ofdm_symbols, tuple(pilot_indices), num_bits_per_symbol, coderate, crc_polynomial)
+
+    # Reuse the cached chain if it exists
+    if key in receiver_chain_cache:
+        receiver_chain_cache_stats["hits"] += 1
+        receiver_chain_cache.move_to_end(key)
+        return receiver_chain_cache[key]
+    receiver_chain_cache_stats["misses"] += 1
 
-    batch_size = num_simulations * frame_size
-    
     # Create instances of needed objects
     resource_grid_config = sn.ofdm.ResourceGrid(
         num_ofdm_symbols=num_ofdm_symbols,
@@ -347,30 +779,313 @@ def decode_frame(received_rg, no, num_simulations, frame_size, simulation_params
     # LDPC Decoder: Decodes the coded bits back into information bits
     decoder = sn.fec.ldpc.LDPC5GDecoder(encoder, hard_out=True)
 
+    # Least Squares Channel Estimator: Estimates the channel coefficients
     ls_est = sn.ofdm.LSChannelEstimator(resource_grid_config, interpolation_type="nn")
-    
+
+    receiver_chain = {
+        "resource_grid_config": resource_grid_config,
+        "demapper": demapper,
+        "encoder": encoder,
+        "decoder": decoder,
+        "ls_est": ls_est,
+        "data_indices": np.setdiff1d(np.arange(num_ofdm_symbols), pilot_indices),
+        "crc_decoder": sn.fec.crc.CRCDecoder(sn.fec.crc.CRCEncoder(crc_polynomial)) if crc_polynomial else None,
+        "mapper": sn.mapping.Mapper("qam", num_bits_per_symbol),
+        "resource_grid_mapper": sn.ofdm.ResourceGridMapper(resource_grid_config)
+    }
+
+    # Add the new chain and evict the least recently used one if the cache is full
+    receiver_chain_cache[key] = receiver_chain
+    if len(receiver_chain_cache) > RECEIVER_CHAIN_CACHE_SIZE:
+        receiver_chain_cache.popitem(last=False)
+
+    return receiver_chain
+
+def receive_slots(receiver_chain, received_rg, no, profiler=None):
+    """
+    Run the receiver chain on a batch of slots.
+
+    Args:
+        receiver_chain: Dictionary of receiver chain objects returned by get_receiver_chain.
+        received_rg: The received resource grids of the slots, of shape (num_slots, num_ofdm_symbols, fft_size).
+        no: The noise variance.
+        profiler: Optional SimulationProfiler timing the receiver stages.
+
+    Returns:
+        bits_hat: The estimated bits.
+        h_hat: The estimated channel coefficients.
+    """
+    demapper = receiver_chain["demapper"]
+    decoder = receiver_chain["decoder"]
+    ls_est = receiver_chain["ls_est"]
+    data_indices = receiver_chain["data_indices"]
+    num_data_symbols = len(data_indices) * received_rg.shape[2]
+    num_slots = received_rg.shape[0]
     
     # Perform the decoding process
-      # Estimate the channel coefficients (h_hat) and error variance (err_var)
-    h_hat, err_var = ls_est([tf.expand_dims(tf.expand_dims(received_rg, axis=1), axis=1), no]) # Add two dimensions to match the input shape of the LSChannelEstimator
-    h_hat = tf.squeeze(h_hat, axis=[1,2,3,4])  # Remove the added dimensions
+    # Estimate the channel coefficients (h_hat) and error variance (err_var)
+    with profile_stage(profiler, "channel_estimation", num_slots):
+        h_hat, err_var = ls_est([tf.expand_dims(tf.expand_dims(received_rg, axis=1), axis=1), no]) # Add two dimensions to match the input shape of the LSChannelEstimator
+        h_hat = tf.squeeze(h_hat, axis=[1,2,3,4])  # Remove the added dimensions
     
-    # Equalize the received resource grid using the estimated channel coefficients
-    received_rg_equalized = tf.math.divide_no_nan(received_rg, h_hat)
+    with profile_stage(profiler, "demapping", num_slots):
+        # Equalize the received resource grid using the estimated channel coefficients
+        received_rg_equalized = tf.math.divide_no_nan(received_rg, h_hat)
 
-    # Extract the data symbols from the equalized resource grid
-    received_data_rg = tf.gather(received_rg_equalized, data_indices, axis=1)
-    # Flatten the received symbols to match the input shape of the demapper
-    received_symbols= tf.reshape(received_data_rg, (batch_size, -1))
+        # Extract the data symbols from the equalized resource grid
+        received_data_rg = tf.gather(received_rg_equalized, data_indices, axis=1)
+        # Flatten the received symbols to match the input shape of the demapper
+        received_symbols= tf.reshape(received_data_rg, (-1, num_data_symbols))
 
-    # Demap the received symbols to log-likelihood ratios (LLRs)
-    llr = demapper([received_symbols, no])
+        # Demap the received symbols to log-likelihood ratios (LLRs)
+        llr = demapper([received_symbols, no])
     
     # Decode the LLRs to estimate the transmitted bits
-    bits_hat = decoder(llr)
+    with profile_stage(profiler, "ldpc_decoding", num_slots):
+        bits_hat = decoder(llr)
     
     return bits_hat, h_hat
 
+# Slot batch sizes the XLA receiver is padded to, so that varying numbers of dirty slots reuse the same compiled programs
+SLOT_BATCH_BUCKETS = tuple(64 * 2 ** i for i in range(11))
+
+# Number of times a compiled receiver was traced
+receiver_trace_stats = {"traces": 0}
+
+def get_slot_batch_bucket(num_slots):
+    """
+    Get the bucketed batch size a batch of slots is padded to.
+
+    Args:
+        num_slots: Number of slots in the batch.
+
+    Returns:
+        bucket_size: The smallest bucket holding the batch, or a multiple of the largest bucket.
+    """
+    for bucket_size in SLOT_BATCH_BUCKETS:
+        if num_slots <= bucket_size:
+            return bucket_size
+    largest_bucket = SLOT_BATCH_BUCKETS[-1]
+    return -(-num_slots // largest_bucket) * largest_bucket
+
+def get_compiled_receiver(simulation_params, jit_compile=False):
+    """
+    Get the receiver chain compiled as a tf.function for the given simulation parameters.
+
+    The compiled function is stored with the cached receiver chain and has a fixed input signature
+    (any number of slots, complex64 resource grids and a float32 noise variance). The XLA compatible mode
+    of Sionna is only enabled while the XLA function is traced, and the previous mode is restored after.
+
+    Args:
+        simulation_params: Dictionary containing all simulation parameters.
+        jit_compile: Boolean indicating whether the function is compiled with XLA.
+
+    Returns:
+        compiled_receiver: The compiled function taking (received_rg, no) and returning (bits_hat, h_hat).
+    """
+    receiver_chain = get_receiver_chain(simulation_params)
+    compiled_receivers = receiver_chain.setdefault("compiled_receivers", {})
+
+    if jit_compile not in compiled_receivers:
+        resource_grid_config = receiver_chain["resource_grid_config"]
+        input_signature = [
+            tf.TensorSpec([None, resource_grid_config.num_ofdm_symbols, resource_grid_config.fft_size], tf.complex64),
+            tf.TensorSpec([], tf.float32)
+        ]
+
+        def compiled_receiver(received_rg, no):
+            # Only executed when the function is traced
+            receiver_trace_stats["traces"] += 1
+            if not jit_compile:
+                return receive_slots(receiver_chain, received_rg, no)
+            # Some Sionna layers need their XLA compatible implementation, which is only enabled while the XLA
+            # program is traced so that the eager and graph receivers and the transmitter are not affected
+            previous_xla_compat = sn.config.xla_compat
+            sn.config.xla_compat = True
+            try:
+                return receive_slots(receiver_chain, received_rg, no)
+            finally:
+                sn.config.xla_compat = previous_xla_compat
+
+        compiled_receivers[jit_compile] = tf.function(compiled_receiver, input_signature=input_signature, jit_compile=jit_compile)
+
+    return compiled_receivers[jit_compile]
+
+def decode_frame(received_rg, no, simulation_params, profiler=None):
+    """
+    Decode a batch of slots and output the estimated bits and channel coefficients.
+
+    The receiver runs eagerly, as a tf.function ("graph") or as an XLA compiled tf.function ("xla"),
+    according to the optional "execution_mode" of the "Receiver parameters". The input signature of the
+    compiled functions accepts any number of slots, so the graph is traced once. XLA compiles a program per
+    batch shape, so in this mode the batch is zero-padded to a bucketed size.
+
+    Args:
+        received_rg: The received resource grids of the slots, of shape (num_slots, num_ofdm_symbols, fft_size).
+        no: The noise variance.
+        simulation_params: Dictionary containing all simulation parameters.
+        profiler: Optional SimulationProfiler timing the receiver stages.
+
+    Returns:
+        bits_hat: The estimated bits.
+        h_hat: The estimated channel coefficients.
+    """
+    execution_mode = simulation_params.get("Receiver parameters", {}).get("execution_mode", "eager")
+    
+    # Get the (cached) receiver chain objects
+    receiver_chain = get_receiver_chain(simulation_params)
+
+    if execution_mode == "eager":
+        return receive_slots(receiver_chain, received_rg, no, profiler)
+    if execution_mode not in ("graph", "xla"):
+        raise ValueError(f"Unknown receiver execution mode: {execution_mode}")
+
+    compiled_receiver = get_compiled_receiver(simulation_params, jit_compile=execution_mode == "xla")
+
+    # Pad the batch to its bucket so that the XLA program is reused
+    num_slots = received_rg.shape[0]
+    padded_rg = received_rg
+    if execution_mode == "xla":
+        padded_rg = tf.pad(received_rg, [[0, get_slot_batch_bucket(num_slots) - num_slots], [0, 0], [0, 0]])
+
+    with profile_stage(profiler, "compiled_receiver", num_slots):
+        bits_hat, h_hat = compiled_receiver(padded_rg, tf.cast(no, tf.float32))
+    
+    return bits_hat[:num_slots], h_hat[:num_slots]
+
+def search_new_identified_ues_batched(bits_hat, bits, replica_map, identified_mask, slots=None):
+    """
+    Search for the identified UEs inside bits_hat for all the (UE, slot) pairs at once.
+
+    The estimated bits of every replica slot of the not yet identified UEs are gathered and compared
+    against the stacked original bits of the UEs in a single tensor operation. A decoded slot carries a
+    single codeword, so at most one UE is identified per slot: when UEs sharing a codeword of the pool
+    collide in a slot, only the first one is identified from it and the others are left to the next passes.
+
+    When the slots are given, only the UEs that transmitted in them are compared, looked up in the inverse
+    index of the replica map, so the cost is the number of replicas in the slots and not the number of UEs.
+
+    Args:
+        bits_hat: The estimated bits of all the slots of the hyper frame.
+        bits: Tensor of original bits for each UE.
+        replica_map: ReplicaMap of the replicas of the UEs.
+        identified_mask: Boolean array of shape (num_ues,) flagging the already identified UEs.
+        slots: Optional array of the slots to search (e.g. the slots decoded again in this pass), by default all the slots.
+
+    Returns:
+        new_identified_mask: Boolean array of shape (num_ues,) flagging the newly identified UEs.
+        new_identified_positions: Array of the slots where the new UEs were identified.
+    """
+    num_ues = replica_map.num_ues
+
+    # Keep only the (UE, slot) pairs of the searched slots whose UEs are not identified yet
+    if slots is None:
+        ue_ids = replica_map.ue_ids
+        slot_ids = replica_map.slot_ids
+    else:
+        replica_positions = replica_map.get_slot_replica_positions(slots)
+        ue_ids = replica_map.ue_ids[replica_positions]
+        slot_ids = replica_map.slot_ids[replica_positions]
+    is_candidate = ~identified_mask[ue_ids]
+    ue_ids = ue_ids[is_candidate]
+    slot_ids = slot_ids[is_candidate]
+
+    new_identified_mask = np.zeros(num_ues, dtype=bool)
+    if len(ue_ids) == 0:
+        return new_identified_mask, slot_ids
+
+    # Compare the estimated bits of every pair against the bits of its UE
+    is_match = tf.reduce_all(tf.equal(tf.gather(bits_hat, slot_ids), tf.gather(bits, ue_ids)), axis=1).numpy()
+
+    # Keep the first matching UE of every slot and reduce the matches to a per-UE mask
+    new_identified_positions, first_matches = np.unique(slot_ids[is_match], return_index=True)
+    new_identified_mask[ue_ids[is_match][first_matches]] = True
+
+    return new_identified_mask, new_identified_positions
+
+def check_crc(bits_hat, simulation_params):
+    """
+    Check the CRC of a batch of decoded transport blocks at once.
+
+    Args:
+        bits_hat: The estimated bits of the slots, of shape (num_slots, k).
+        simulation_params: Dictionary containing all simulation parameters, with the crc_polynomial
+                           in the transport block parameters.
+
+    Returns:
+        crc_valid: Boolean array of shape (num_slots,) flagging the slots whose CRC is valid.
+    """
+    crc_decoder = get_receiver_chain(simulation_params)["crc_decoder"]
+    _, crc_valid = crc_decoder(bits_hat)
+    return crc_valid.numpy()[:, 0]
+
+def reencode_transport_blocks(bits_hat, simulation_params):
+    """
+    Rebuild the resource grids of decoded transport blocks, as the transmitter does in generate_ues.
+
+    Args:
+        bits_hat: The decoded transport blocks, of shape (num_blocks, k).
+        simulation_params: Dictionary containing all simulation parameters.
+
+    Returns:
+        resource_grids: The re-encoded resource grids, of shape (num_blocks, num_ofdm_symbols, fft_size).
+    """
+    receiver_chain = get_receiver_chain(simulation_params)
+    symbols = receiver_chain["mapper"](receiver_chain["encoder"](bits_hat))
+    resource_grid = receiver_chain["resource_grid_mapper"](symbols[:, tf.newaxis, tf.newaxis])
+    return resource_grid[:, 0, 0]
+
+def search_new_identified_ues_crc(bits_hat, bits, crc_valid, replica_map, identified_mask, slots, frame_size, num_ues_per_frame, num_ue_id_bits):
+    """
+    Search for the identified UEs from the CRC of the decoded slots, without the transmitted bits.
+
+    Every searched slot whose CRC is valid and whose header holds a valid index identifies the UE read in
+    the header, as a real receiver would. The transmitted bits are only used for the accounting of the
+    undetected errors (slots with a valid CRC but a wrong transport block): those false positives are
+    identified and cancelled like the others, with the codeword re-encoded from their wrong bits, but
+    they are flagged so that they are not counted as successes.
+
+    Args:
+        bits_hat: The estimated bits of all the slots of the hyper frame.
+        bits: Tensor of original bits for each UE.
+        crc_valid: Boolean array of shape (batch_size,) flagging the slots whose CRC is valid.
+        replica_map: ReplicaMap of the replicas of the UEs.
+        identified_mask: Boolean array of shape (num_ues,) flagging the already identified UEs.
+        slots: Array of the slots to search (e.g. the slots decoded again in this pass).
+        frame_size: Total number of slots in the frame.
+        num_ues_per_frame: Number of UEs per frame.
+        num_ue_id_bits: Number of bits of the header carrying the index of the UE in its frame.
+
+    Returns:
+        new_identified_mask: Boolean array of shape (num_ues,) flagging the newly identified UEs.
+        new_identified_positions: Array with the slot where every new UE was identified, in the order of the UEs.
+        new_false_mask: Boolean array of shape (num_ues,) flagging the new UEs identified from a wrong transport block.
+        num_undetected_errors: Number of searched slots with a valid CRC but a wrong transport block.
+    """
+    new_identified_mask = np.zeros(replica_map.num_ues, dtype=bool)
+    new_false_mask = np.zeros(replica_map.num_ues, dtype=bool)
+    crc_slots = np.asarray(slots)[crc_valid[slots]]
+    if len(crc_slots) == 0:
+        return new_identified_mask, crc_slots, new_false_mask, 0
+
+    # Read the UE of every slot with a valid CRC from its header
+    crc_bits_hat = tf.gather(bits_hat, crc_slots)
+    frame_ue_ids = read_ue_id_header(crc_bits_hat[:, :num_ue_id_bits].numpy())
+    is_valid_id = frame_ue_ids < num_ues_per_frame
+    claimed_ues = np.where(is_valid_id, (crc_slots // frame_size) * num_ues_per_frame + frame_ue_ids, 0)
+
+    # Ground truth, only used to count the undetected errors
+    is_correct = is_valid_id & tf.reduce_all(tf.equal(crc_bits_hat, tf.gather(bits, claimed_ues)), axis=1).numpy()
+    num_undetected_errors = int((~is_correct).sum())
+
+    # Keep the first slot of every newly identified UE (several of its replicas may be decoded in the same pass)
+    is_new = is_valid_id & ~identified_mask[claimed_ues]
+    new_ues, first_indices = np.unique(claimed_ues[is_new], return_index=True)
+    new_identified_mask[new_ues] = True
+    new_false_mask[new_ues] = ~is_correct[is_new][first_indices]
+
+    return new_identified_mask, crc_slots[is_new][first_indices], new_false_mask, num_undetected_errors
+
 def search_new_identified_ues(bits_hat, bits, slot_indices, identified_ues):
     """
     Search for the identified UEs inside bits_hat.
@@ -386,118 +1101,415 @@ def search_new_identified_ues(bits_hat, bits, slot_indices, identified_ues):
         identified_positions: Set of positions where UEs were identified.
         new_ues_found: Boolean flag indicating if new UEs were found.
     """
-    num_ues = len(bits)
-    new_identified_ues = set()
-    new_identified_positions = set()
-    new_ues_found = False
-    
-    for i in range(num_ues):
-        if i not in identified_ues:
-            # Get the position of the bits in the bits_hat tensor
-            ue_slot_indices = slot_indices[i]
-            for slot_index in ue_slot_indices:
-                is_match = tf.reduce_all(tf.equal(bits_hat[slot_index], bits[i]))
-                if is_match:
-                    new_identified_ues.add(i)
-                    new_identified_positions.add(slot_index)
-                    new_ues_found = True
+    identified_mask = np.zeros(len(slot_indices), dtype=bool)
+    identified_mask[list(identified_ues)] = True
+
+    # Flatten the slot indices of the UEs
+    flat_slot_indices = np.concatenate([np.asarray(ue_slot_indices, dtype=np.int32) for ue_slot_indices in slot_indices] + [np.zeros(0, dtype=np.int32)])
+    replica_map = ReplicaMap(flat_slot_indices, [len(ue_slot_indices) for ue_slot_indices in slot_indices], bits_hat.shape[0])
+
+    new_identified_mask, new_identified_positions = search_new_identified_ues_batched(bits_hat, bits, replica_map, identified_mask)
+
+    new_identified_ues = set(np.flatnonzero(new_identified_mask).tolist())
+    new_identified_positions = set(new_identified_positions.tolist())
+    new_ues_found = len(new_identified_ues) > 0
                 
     return new_identified_ues, new_identified_positions, new_ues_found
 
-def remove_replicas_of_newlly_identified_ues(y_resource_grids, new_identified_ues, resourse_grids, slot_indices, num_replicas, channels, is_perfect_SIC):
+def remove_replicas_of_newlly_identified_ues(y_resource_grids, new_identified_ues, resourse_grids, replica_map, channels, is_perfect_SIC, new_ue_resource_grids=None):
     """
-    Remove the replicas of a UE when it is recognized.
+    Remove the replicas of all the newly identified UEs at once.
+
+    With perfect SIC all the reconstructed replicas are subtracted with a single tf.tensor_scatter_nd_sub.
+    With imperfect SIC the phase of every replica is estimated with a matched filter in one reduction
+    before the subtraction. When several newly identified UEs share a slot, the replicas are cancelled in
+    rounds (the first UE of every slot, then the second, ...), so that each phase estimate sees the slot
+    cleaned from the UEs before it, as in a UE-by-UE cancellation.
 
     Args:
-        received_frame: The received IRSA frame.
-        resource_grid_list: List of resource grids for each UE.
-        replicas_indices_list: List of replica indices for each UE.
-        identified_ues: List of indices of recognized UEs.
+        y_resource_grids: The received IRSA frame.
+        new_identified_ues: Set of indices of the newly identified UEs.
+        resourse_grids: Tensor of resource grids for each UE.
+        replica_map: ReplicaMap of the replicas of the UEs.
+        channels: The channel coefficient of each replica as a tf.RaggedTensor of shape (num_ues, (num_replicas)).
+        is_perfect_SIC: Boolean indicating whether the true channel coefficients are used for the cancellation.
+        new_ue_resource_grids: Optional resource grids of the newly identified UEs in increasing order of UE index
+                               (e.g. re-encoded from the decoded bits), by default the transmitted resource grids.
 
     Returns:
-        received_frame: The updated received frame with replicas removed.
+        y_resource_grids_cleaned: The updated received frame with replicas removed.
     """
+    new_identified_ues = np.sort(np.fromiter(new_identified_ues, dtype=np.int64))
+    if len(new_identified_ues) == 0:
+        return y_resource_grids
+
+    # Gather the (UE, slot) pairs of the replicas to remove
+    replica_positions = replica_map.get_replica_positions(new_identified_ues)
+    ue_ids = replica_map.ue_ids[replica_positions]
+    slot_ids = replica_map.slot_ids[replica_positions]
+    if new_ue_resource_grids is None:
+        replica_rgs = tf.gather(resourse_grids, ue_ids)
+    else:
+        replica_rgs = tf.gather(new_ue_resource_grids, np.searchsorted(new_identified_ues, ue_ids))
+
+    if is_perfect_SIC:
+        # Reconstruct all the replicas with their true channel coefficients and remove them at once
+        replica_channels = tf.gather(channels.values, replica_positions)[:, tf.newaxis, tf.newaxis]
+        return tf.tensor_scatter_nd_sub(y_resource_grids, slot_ids[:, np.newaxis], replica_rgs * replica_channels)
+
+    # Rank of every replica among the replicas removed from the same slot
+    order = np.argsort(slot_ids, kind="stable")
+    sorted_slot_ids = slot_ids[order]
+    is_first_in_slot = np.r_[True, sorted_slot_ids[1:] != sorted_slot_ids[:-1]]
+    first_position = np.maximum.accumulate(np.where(is_first_in_slot, np.arange(len(order)), 0))
+    slot_rank = np.empty(len(order), dtype=np.int64)
+    slot_rank[order] = np.arange(len(order)) - first_position
+
     y_resource_grids_cleaned = y_resource_grids
+    for rank in range(slot_rank.max() + 1):
+        in_round = np.flatnonzero(slot_rank == rank)
+        round_slot_ids = slot_ids[in_round]
+        round_rgs = tf.gather(replica_rgs, in_round)
 
-    for ue in new_identified_ues:
-        # Extract the resource grid of the current ue
-        ue_rg=resourse_grids[ue]
-        ue_channels=channels[ue]
-        ue_slot_indices = slot_indices[ue]
-        ue_num_replicas = num_replicas[ue]
-        for replica_ind in range(ue_num_replicas):
-            slot_indice=ue_slot_indices[replica_ind]
-            y_replica_slot = y_resource_grids_cleaned[slot_indice]
-            if is_perfect_SIC:
-                # Extract the Channel coefficient of the replica
-                
-                h_hat_replica = ue_channels[replica_ind]
-            else:
-                # Estimate the channel coefficient of the replica
-                phi_hat = tf.math.angle(tf.math.reduce_sum(y_replica_slot * tf.math.conj(ue_rg)))
-                h_hat_replica = tf.complex(tf.cos(phi_hat), tf.sin(phi_hat))
-            
-            
-            clean_slot = y_replica_slot - ue_rg * h_hat_replica
-            y_resource_grids_cleaned = tf.tensor_scatter_nd_update(y_resource_grids_cleaned, [[slot_indice]], tf.expand_dims(clean_slot, axis=0))
+        # Estimate the channel coefficient of every replica of the round with a matched filter
+        y_replica_slots = tf.gather(y_resource_grids_cleaned, round_slot_ids)
+        phi_hat = tf.math.angle(tf.math.reduce_sum(y_replica_slots * tf.math.conj(round_rgs), axis=[1, 2]))
+        h_hat_replicas = tf.complex(tf.cos(phi_hat), tf.sin(phi_hat))[:, tf.newaxis, tf.newaxis]
+
+        # Remove the replicas of the round
+        y_resource_grids_cleaned = tf.tensor_scatter_nd_sub(y_resource_grids_cleaned, round_slot_ids[:, np.newaxis], round_rgs * h_hat_replicas)
 
     return y_resource_grids_cleaned
 
-def decode_irsa_frame(y_resource_grids, no, simulation_params, resourse_grids, bits, slot_indices,num_replicas, num_simulations, frame_size, num_ues_per_frame, channels):
+def decode_irsa_frame(y_resource_grids, no, simulation_params, resourse_grids, bits, replica_map, num_simulations, frame_size, num_ues_per_frame, channels, pass_report=None, profiler=None):
     """
     Decode an IRSA frame.
 
+    Only the slots that changed since the previous pass (the dirty slots) are decoded: they are gathered
+    into a compact batch and their estimated bits are scattered back into the bits of the whole frame.
+    The bits of the other slots did not change, so only the UEs that transmitted in the dirty slots
+    are compared against them. With a crc_polynomial in the transport block parameters, the UEs are
+    identified from a batched CRC check of the dirty slots instead (see search_new_identified_ues_crc),
+    their replicas are cancelled with the codewords re-encoded from the decoded bits, and the pass report
+    also holds the number of slots with a valid CRC and of undetected errors. The UEs identified from a
+    wrong transport block are cancelled (with their wrong codeword) but not returned as identified.
+
     Args:
         y_resource_grids: The received IRSA frame after passing through the channel.
         no: The noise variance.
         simulation_params: Dictionary containing all simulation parameters.
         resourse_grids: List of resource grids for each UE.
         bits: List of original bits for each UE.
-        slot_indices: List of slot indices for each UE.
+        replica_map: ReplicaMap of the replicas of the UEs.
         num_simulations: Number of simulations to run.
         frame_size: Total number of slots in the frame.
         num_ues_per_frame: Number of UEs per frame.
-        probabilities: Probabilities for selecting number of replicas.
+        channels: The channel coefficient of each replica as a tf.RaggedTensor of shape (num_ues, (num_replicas)).
+        pass_report: Optional list to which a dictionary with the number of decoded slots and
+                     newly identified UEs is appended for each pass.
+        profiler: Optional SimulationProfiler timing the stages of each pass.
 
     Returns:
-        identified_ues: List of identified UEs.
-        slots_to_decode: List of slots to decode in future passes.
+        identified_ues: List of the correctly identified UEs.
     """
     # Extract necessary parameters from the simulation_params dictionary
     channel_params = simulation_params["Channel parameters"]
     is_perfect_SIC = channel_params['is_perfect_SIC']
+    transport_block_params = simulation_params["Transport block parameters"]
+    crc_polynomial = transport_block_params.get('crc_polynomial')
+    num_ue_id_bits = transport_block_params.get('num_ue_id_bits', 16)
     
     num_ues = num_simulations * num_ues_per_frame
+    batch_size = num_simulations * frame_size
 
     # Start decoding the received signal slot by slot
-    identified_ues = set()
+    identified_mask = np.zeros(num_ues, dtype=bool)
+    # UEs identified by the receiver from a wrong transport block (undetected errors of the CRC)
+    false_identified_mask = np.zeros(num_ues, dtype=bool)
+    crc_valid = np.zeros(batch_size, dtype=bool)
+    
+    # All the slots have to be decoded in the first pass
+    dirty_slots = np.ones(batch_size, dtype=bool)
+    bits_hat = None
     
     pass_num = 1
-    while len(identified_ues) < num_ues:
-        print(f"\nPass {pass_num}:")
-        new_identified_ues = set()
-        new_identified_positions = set()
-
-        bits_hat, h_hat = decode_frame(y_resource_grids, no, num_simulations, frame_size, simulation_params)
-        new_ues, new_positions, new_ues_found = search_new_identified_ues(bits_hat, bits, slot_indices, identified_ues)
-        
-        new_identified_ues.update(new_ues)
-        new_identified_positions.update(new_positions)
-
-        if new_ues_found:
-            y_resource_grids = remove_replicas_of_newlly_identified_ues(y_resource_grids, new_identified_ues, resourse_grids, slot_indices, num_replicas, channels, is_perfect_SIC)
-            identified_ues.update(new_identified_ues)
+    while not identified_mask.all():
+        dirty_slot_indices = np.flatnonzero(dirty_slots)
+        print(f"\nPass {pass_num}: decoding {len(dirty_slot_indices)} of {batch_size} slots")
+        if profiler is not None:
+            profiler.current_pass = pass_num
+        # Decode only the dirty slots and scatter their bits back into the frame
+        dirty_bits_hat, _ = decode_frame(tf.gather(y_resource_grids, dirty_slot_indices), no, simulation_params, profiler)
+        if bits_hat is None:
+            bits_hat = dirty_bits_hat
+        else:
+            bits_hat = tf.tensor_scatter_nd_update(bits_hat, dirty_slot_indices[:, np.newaxis], dirty_bits_hat)
+        dirty_slots[:] = False
+
+        if crc_polynomial:
+            with profile_stage(profiler, "crc_check", len(dirty_slot_indices)):
+                crc_valid[dirty_slot_indices] = check_crc(dirty_bits_hat, simulation_params)
+            with profile_stage(profiler, "identification", len(dirty_slot_indices)):
+                new_identified_mask, new_identified_positions, new_false_mask, num_undetected_errors = search_new_identified_ues_crc(
+                    bits_hat, bits, crc_valid, replica_map, identified_mask, dirty_slot_indices, frame_size, num_ues_per_frame, num_ue_id_bits)
+        else:
+            with profile_stage(profiler, "identification", len(dirty_slot_indices)):
+                new_identified_mask, new_identified_positions = search_new_identified_ues_batched(bits_hat, bits, replica_map, identified_mask, dirty_slot_indices)
+        new_identified_ues = np.flatnonzero(new_identified_mask)
+
+        if pass_report is not None:
+            pass_report.append({"pass": pass_num, "decoded_slots": len(dirty_slot_indices), "new_identified_ues": len(new_identified_ues)})
+            if crc_polynomial:
+                pass_report[-1].update({"crc_valid_slots": int(crc_valid[dirty_slot_indices].sum()), "undetected_errors": num_undetected_errors})
+
+        if len(new_identified_ues) > 0:
+            new_ue_resource_grids = None
+            if crc_polynomial:
+                # The receiver only knows the decoded bits of the new UEs
+                with profile_stage(profiler, "reencoding", len(new_identified_positions)):
+                    new_ue_resource_grids = reencode_transport_blocks(tf.gather(bits_hat, new_identified_positions), simulation_params)
+            # Every replica of the new UEs is cancelled
+            with profile_stage(profiler, "sic_cancellation", int(replica_map.replica_counts[new_identified_ues].sum())):
+                y_resource_grids = remove_replicas_of_newlly_identified_ues(y_resource_grids, new_identified_ues, resourse_grids, replica_map, channels, is_perfect_SIC, new_ue_resource_grids)
+            identified_mask |= new_identified_mask
+            if crc_polynomial:
+                false_identified_mask |= new_false_mask
+            # The slots holding the removed replicas changed and have to be decoded again
+            dirty_slots[replica_map.get_slots(new_identified_ues)] = True
         else:
             print("No new UEs were identified.")
             break
 
         pass_num += 1
 
-    return list(identified_ues)
-def run_simulation(simulation_params, num_simulations, num_ues_per_frame, frame_size, probabilities, ebno_db):
+    if profiler is not None:
+        profiler.current_pass = None
+    return np.flatnonzero(identified_mask & ~false_identified_mask).tolist()
+# Default SINR grid (in dB) of the BLER tables of the PHY abstraction
+BLER_TABLE_SINR_DB = np.arange(-5.0, 10.5, 0.5)
+
+# BLER tables loaded so far, keyed on the fingerprint of their configuration
+bler_table_cache = {}
+
+def is_phy_abstraction_enabled(simulation_params):
+    """
+    Check whether the PHY abstraction replaces the decoding of the slots.
+
+    Args:
+        simulation_params: Dictionary containing all simulation parameters.
+
+    Returns:
+        is_enabled: True if the "PHY abstraction parameters" of the simulation are enabled.
+    """
+    return simulation_params.get("PHY abstraction parameters", {}).get("is_enabled", False)
+
+def build_bler_table(simulation_params, sinr_db_values, num_blocks, rng_streams=None):
+    """
+    Build the BLER-vs-SINR table of the receiver with single-slot simulations.
+
+    For every SINR, num_blocks slots holding a single UE with a random phase shift are passed through an
+    AWGN channel of noise variance 1/SINR (the UE has a unit power per resource element) and decoded
+    with the full receiver chain.
+
+    Args:
+        simulation_params: Dictionary containing all simulation parameters.
+        sinr_db_values: SINR values in dB.
+        num_blocks: Number of simulated slots per SINR.
+        rng_streams: Optional random streams (see get_rng_streams), by default the global generators are used.
+
+    Returns:
+        bler_values: Array with the BLER at each SINR.
+    """
+    resource_grids, bits = generate_ues(simulation_params, num_blocks, 1, rng_streams)
+    uniform = tf.random.uniform if rng_streams is None else rng_streams["channel"].uniform
+
+    bler_values = []
+    for sinr_db in sinr_db_values:
+        no = tf.constant(10 ** (-sinr_db / 10), dtype=tf.float32)
+        angles = uniform([num_blocks], minval=0, maxval=2 * np.pi)
+        channel_coeff = tf.complex(tf.cos(angles), tf.sin(angles))[:, tf.newaxis, tf.newaxis]
+        received_rg = add_awgn(resource_grids * channel_coeff, no, rng_streams and rng_streams["noise"])
+        bits_hat, _ = decode_frame(received_rg, no, simulation_params)
+        block_errors = tf.reduce_any(tf.not_equal(bits_hat, bits), axis=1)
+        bler_values.append(float(tf.reduce_mean(tf.cast(block_errors, tf.float32))))
+
+    return np.array(bler_values)
+
+def get_bler_table(simulation_params):
+    """
+    Get the BLER-vs-SINR table of the PHY abstraction for the given simulation parameters.
+
+    The table depends on the modulation, the coderate and the carrier parameters. It is built once
+    (see build_bler_table) and cached in memory and on disk, in the table_dir of the "PHY abstraction
+    parameters", in a file named after the fingerprint of its configuration.
+
+    Args:
+        simulation_params: Dictionary containing all simulation parameters.
+
+    Returns:
+        sinr_db_values: Array with the SINR values of the table in dB.
+        bler_values: Array with the BLER at each SINR.
+    """
+    abstraction_params = simulation_params.get("PHY abstraction parameters", {})
+    table_dir = abstraction_params.get("table_dir", "bler_tables")
+    sinr_db_values = np.asarray(abstraction_params.get("sinr_db_values", BLER_TABLE_SINR_DB), dtype=float)
+    num_blocks = abstraction_params.get("num_blocks", 1000)
+
+    transport_block_params = simulation_params["Transport block parameters"]
+    num_bits_per_symbol = transport_block_params['num_bits_per_symbol']
+    coderate = transport_block_params['coderate']
+    table_config = {
+        "Carrier parameters": simulation_params["Carrier parameters"],
+        "num_bits_per_symbol": num_bits_per_symbol,
+        "coderate": coderate,
+        "sinr_db_values": sinr_db_values.tolist(),
+        "num_blocks": num_blocks,
+        "seed": abstraction_params.get("seed", 0)
+    }
+    fingerprint = get_point_fingerprint(table_config)
+    if fingerprint in bler_table_cache:
+        return bler_table_cache[fingerprint]
+
+    num_resource_blocks = simulation_params["Carrier parameters"]['num_resource_blocks']
+    table_path = os.path.join(table_dir, f"bler_table_qam{2**num_bits_per_symbol}_r{coderate}_{num_resource_blocks}rb_{fingerprint[:12]}.npz")
+    if os.path.exists(table_path):
+        with np.load(table_path) as table:
+            bler_values = table["bler_values"]
+    else:
+        bler_values = build_bler_table(simulation_params, sinr_db_values, num_blocks, get_rng_streams(abstraction_params.get("seed", 0), branch="bler_table"))
+        # Write the table atomically so that concurrent sweep workers never read a partial file
+        os.makedirs(table_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=table_dir, suffix='.tmp', delete=False) as temp_file:
+            np.savez(temp_file, sinr_db_values=sinr_db_values, bler_values=bler_values)
+        os.replace(temp_file.name, table_path)
+
+    bler_table_cache[fingerprint] = (sinr_db_values, bler_values)
+    return bler_table_cache[fingerprint]
+
+def decode_irsa_frame_abstracted(no, simulation_params, replica_map, num_simulations, frame_size, num_ues_per_frame, pass_report=None, rng=None):
+    """
+    Decode an IRSA frame with the PHY abstraction.
+
+    The SIC loop runs on the slots only: in every pass, the decoding of every dirty slot succeeds with
+    probability 1 - BLER(SINR), with the BLER interpolated in the BLER table and the SINR of the slot given by
+    the unit power of a UE over the power of the other not yet identified UEs, the noise and the residual
+    interference of the cancelled replicas. A decoded slot yields one of its UEs at random. With imperfect
+    SIC, every cancelled replica leaves the residual of a matched-filter phase estimate, i.e. the interference
+    plus noise power of its slot divided by twice the number of resource elements of the slot.
+
+    Args:
+        no: The noise variance.
+        simulation_params: Dictionary containing all simulation parameters.
+        replica_map: ReplicaMap of the replicas of the UEs.
+        num_simulations: Number of simulations to run.
+        frame_size: Total number of slots in the frame.
+        num_ues_per_frame: Number of UEs per frame.
+        pass_report: Optional list to which a dictionary with the number of decoded slots and
+                     newly identified UEs is appended for each pass.
+        rng: Optional np.random.Generator drawing the decoding, by default the global NumPy generator is used.
+
+    Returns:
+        identified_ues: List of identified UEs.
+    """
+    if rng is None:
+        rng = np.random
+    is_perfect_SIC = simulation_params["Channel parameters"]['is_perfect_SIC']
+    carrier_params = simulation_params["Carrier parameters"]
+    num_resource_elements = carrier_params['num_ofdm_symbols'] * 12 * carrier_params['num_resource_blocks']
+    sinr_db_table, bler_table = get_bler_table(simulation_params)
+
+    num_ues = num_simulations * num_ues_per_frame
+    batch_size = num_simulations * frame_size
+    slot_indices = replica_map.slot_ids
+    ue_ids = replica_map.ue_ids
+
+    # Number of not yet identified UEs and residual interference power of every slot
+    num_active_ues = replica_map.slot_counts
+    residual_power = np.zeros(batch_size)
+    identified_mask = np.zeros(num_ues, dtype=bool)
+
+    # All the slots have to be decoded in the first pass
+    dirty_slots = np.ones(batch_size, dtype=bool)
+
+    pass_num = 1
+    while not identified_mask.all():
+        # Draw the decoding of every dirty slot holding UEs from the BLER at its SINR
+        decoded_slots = np.flatnonzero(dirty_slots & (num_active_ues > 0))
+        interference_plus_noise = no + residual_power + np.maximum(num_active_ues - 1, 0)
+        sinr_db = -10 * np.log10(interference_plus_noise[decoded_slots])
+        is_decoded = np.zeros(batch_size, dtype=bool)
+        is_decoded[decoded_slots] = rng.uniform(size=len(decoded_slots)) >= np.interp(sinr_db, sinr_db_table, bler_table)
+        dirty_slots[:] = False
+
+        # Every decoded slot yields one of its not yet identified UEs at random, the UEs of the decoded
+        # slots being looked up in the inverse index (in replica order, UE after UE)
+        replica_positions = np.sort(replica_map.get_slot_replica_positions(np.flatnonzero(is_decoded)))
+        replica_positions = replica_positions[~identified_mask[ue_ids[replica_positions]]]
+        candidate_slots = slot_indices[replica_positions]
+        order = np.lexsort((rng.uniform(size=len(candidate_slots)), candidate_slots))
+        _, first_candidates = np.unique(candidate_slots[order], return_index=True)
+        new_identified_ues = np.unique(ue_ids[replica_positions][order][first_candidates])
+
+        if pass_report is not None:
+            pass_report.append({"pass": pass_num, "decoded_slots": len(decoded_slots), "new_identified_ues": len(new_identified_ues)})
+        if len(new_identified_ues) == 0:
+            break
+
+        # Cancel the replicas of the new UEs: their slots lose a UE and are decoded again
+        cancelled_slots = replica_map.get_slots(new_identified_ues)
+        if not is_perfect_SIC:
+            np.add.at(residual_power, cancelled_slots, interference_plus_noise[cancelled_slots] / (2 * num_resource_elements))
+        np.subtract.at(num_active_ues, cancelled_slots, 1)
+        identified_mask[new_identified_ues] = True
+        dirty_slots[cancelled_slots] = True
+
+        pass_num += 1
+
+    return np.flatnonzero(identified_mask).tolist()
+
+def validate_phy_abstraction(simulation_params, num_simulations, num_ues_per_frame_values, frame_size, probabilities, ebno_db):
+    """
+    Validate the PHY abstraction against the full PHY on a load sweep.
+
+    Args:
+        simulation_params: Dictionary containing all simulation parameters.
+        num_simulations: Number of simulations to run per load and per PHY.
+        num_ues_per_frame_values: Numbers of UEs per frame of the sweep.
+        frame_size: Total number of slots in the frame.
+        probabilities: Probabilities for selecting number of replicas.
+        ebno_db: The Eb/No value in dB.
+
+    Returns:
+        validation: List with, for every load, the average number of identified UEs per frame and its confidence
+                    interval with the full PHY and with the PHY abstraction, and the time spent by each.
+    """
+    phy_params = {}
+    for phy, is_enabled in [("full", False), ("abstracted", True)]:
+        abstraction_params = dict(simulation_params.get("PHY abstraction parameters", {}), is_enabled=is_enabled)
+        phy_params[phy] = dict(simulation_params, **{"PHY abstraction parameters": abstraction_params})
+    # Build the BLER table beforehand so that it is not timed with the first load
+    get_bler_table(phy_params["abstracted"])
+
+    validation = []
+    for num_ues_per_frame in num_ues_per_frame_values:
+        point_validation = {"num_ues_per_frame": num_ues_per_frame}
+        for phy in ["full", "abstracted"]:
+            start_time = time.perf_counter()
+            stats = run_simulation_adaptive(phy_params[phy], num_ues_per_frame, frame_size, probabilities, ebno_db, num_simulations)
+            point_validation[f"{phy}_time_s"] = time.perf_counter() - start_time
+            point_validation[f"{phy}_identified_ues_per_frame"] = stats["identified_ues_per_frame"]
+            point_validation[f"{phy}_identified_ues_per_frame_ci"] = stats["identified_ues_per_frame_ci"]
+        validation.append(point_validation)
+
+    return validation
+
+def run_simulation(simulation_params, num_simulations, num_ues_per_frame, frame_size, probabilities, ebno_db, pass_report=None, profiler=None, rng_streams=None):
     """
     Run a single simulation.
 
+    With the PHY abstraction enabled (see decode_irsa_frame_abstracted), no resource grid is generated
+    and the decoding of the slots is drawn from the BLER table.
+
     Args:
         simulation_params: Dictionary containing all simulation parameters.
         num_simulations: Number of simulations to run.
@@ -505,137 +1517,603 @@ def run_simulation(simulation_params, num_simulations, num_ues_per_frame, frame_
         frame_size: Total number of slots in the frame.
         probabilities: Probabilities for selecting number of replicas.
         ebno_db: The Eb/No value in dB.
+        pass_report: Optional list to which the per-pass decoding report is appended.
+        profiler: Optional SimulationProfiler recording the time spent in each stage.
+        rng_streams: Optional random streams (see get_rng_streams), by default the global generators are used.
 
     Returns:
         identified_ues: List of identified UEs.
     """
+    batch_size = num_simulations * frame_size
+    if is_phy_abstraction_enabled(simulation_params):
+        # Only the slots of the UEs are drawn, the decoding of the slots is drawn from the BLER table
+        with profile_stage(profiler, "frame_generation", batch_size):
+            replica_map = generate_slot_indices(num_simulations, num_ues_per_frame, frame_size, probabilities, rng_streams and rng_streams["slots"])
+        transport_block_params = simulation_params["Transport block parameters"]
+        no = sn.utils.ebnodb2no(ebno_db, num_bits_per_symbol=transport_block_params['num_bits_per_symbol'], coderate=transport_block_params['coderate'])
+        with profile_stage(profiler, "abstracted_decoding", batch_size):
+            return decode_irsa_frame_abstracted(float(no), simulation_params, replica_map, num_simulations, frame_size, num_ues_per_frame, pass_report, rng_streams and rng_streams["decoding"])
+
     # Generate the IRSA frame
-    irsa_hyper_frame, resource_grids, h_ues, replicas_indices, num_replicas, bits = generate_hyper_irsa_frame(simulation_params, num_simulations, num_ues_per_frame, frame_size, probabilities)
+    with profile_stage(profiler, "frame_generation", batch_size):
+        irsa_hyper_frame, resource_grids, h_ues, replica_map, bits = generate_hyper_irsa_frame(simulation_params, num_simulations, num_ues_per_frame, frame_size, probabilities, rng_streams)
     # Pass the IRSA frame through the AWGN channel
-    received_frame, no = pass_through_awgn(irsa_hyper_frame, ebno_db, simulation_params)
+    with profile_stage(profiler, "awgn", batch_size):
+        received_frame, no = pass_through_awgn(irsa_hyper_frame, ebno_db, simulation_params, rng_streams and rng_streams["noise"])
     # Decode the IRSA frame
-    identified_ues = decode_irsa_frame(received_frame, no, simulation_params, resource_grids, bits, replicas_indices, num_replicas, num_simulations, frame_size, num_ues_per_frame, h_ues)
+    identified_ues = decode_irsa_frame(received_frame, no, simulation_params, resource_grids, bits, replica_map, num_simulations, frame_size, num_ues_per_frame, h_ues, pass_report, profiler)
     
     return identified_ues
 
+# Two-sided 95% quantile of the standard normal distribution
+CONFIDENCE_Z = 1.959963984540054
+
+def get_identified_ues_per_frame(identified_ues, num_simulations, num_ues_per_frame):
+    """
+    Count the identified UEs of every frame.
+
+    Args:
+        identified_ues: List of identified UEs (UE i belongs to frame i // num_ues_per_frame).
+        num_simulations: Number of simulated frames.
+        num_ues_per_frame: Number of UEs per frame.
+
+    Returns:
+        counts: Array of shape (num_simulations,) with the number of identified UEs of every frame.
+    """
+    frames = np.asarray(identified_ues, dtype=np.int64) // num_ues_per_frame
+    return np.bincount(frames, minlength=num_simulations)
+
+def get_wilson_interval(num_successes, num_trials):
+    """
+    Get the 95% Wilson score confidence interval of a success rate.
+
+    Unlike the normal approximation, the interval keeps a non-zero width when all or none of the trials succeed.
+
+    Args:
+        num_successes: Number of successful trials.
+        num_trials: Number of trials.
+
+    Returns:
+        ci: Tuple (low, high) of the 95% confidence interval of the success rate.
+    """
+    rate = num_successes / num_trials
+    z2 = CONFIDENCE_Z**2
+    denominator = 1 + z2 / num_trials
+    center = (rate + z2 / (2 * num_trials)) / denominator
+    half_width = CONFIDENCE_Z * np.sqrt(rate * (1 - rate) / num_trials + z2 / (4 * num_trials**2)) / denominator
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+def get_identified_ues_confidence_interval(num_simulations, num_ues_per_frame, num_identified_ues, sum_squared_identified_ues):
+    """
+    Get the 95% confidence interval of the mean number of identified UEs per frame.
+
+    The UEs of a frame are correlated through their collisions and the SIC cascade, so the interval is the
+    normal interval of the mean of the per-frame counts, built from their sample variance. The Wilson interval
+    of the fraction of identified UEs (scaled to UEs per frame) is its floor, so that the interval keeps a
+    non-zero width when every frame identifies the same number of UEs.
+
+    Args:
+        num_simulations: Number of simulated frames.
+        num_ues_per_frame: Number of UEs per frame.
+        num_identified_ues: Total number of identified UEs.
+        sum_squared_identified_ues: Sum over the frames of the squared number of identified UEs.
+
+    Returns:
+        ci: Tuple (low, high) of the 95% confidence interval, in UEs per frame (within 0 and num_ues_per_frame).
+    """
+    wilson_low, wilson_high = (num_ues_per_frame * bound for bound in get_wilson_interval(num_identified_ues, num_simulations * num_ues_per_frame))
+    if num_simulations < 2:
+        return wilson_low, wilson_high
+    mean = num_identified_ues / num_simulations
+    variance = max(sum_squared_identified_ues - num_simulations * mean**2, 0.0) / (num_simulations - 1)
+    half_width = CONFIDENCE_Z * np.sqrt(variance / num_simulations)
+    return max(min(mean - half_width, wilson_low), 0.0), min(max(mean + half_width, wilson_high), num_ues_per_frame)
+
+def fold_identified_ues(stats, identified_ues, num_simulations, num_ues_per_frame, pass_report=()):
+    """
+    Fold the identified UEs of a chunk of frames into the running accumulators.
+
+    Args:
+        stats: Dictionary with the running accumulators (see run_simulation_streaming), updated in place.
+        identified_ues: List of identified UEs of the chunk.
+        num_simulations: Number of frames of the chunk.
+        num_ues_per_frame: Number of UEs per frame.
+        pass_report: Optional per-pass decoding report of the chunk (see decode_irsa_frame), whose numbers of
+                     slots with a valid CRC and of undetected errors are accumulated.
+    """
+    counts = get_identified_ues_per_frame(identified_ues, num_simulations, num_ues_per_frame)
+    stats["num_chunks"] += 1
+    stats["num_simulations"] += num_simulations
+    stats["num_identified_ues"] += int(counts.sum())
+    stats["num_missed_ues"] += num_simulations * num_ues_per_frame - int(counts.sum())
+    stats["sum_squared_identified_ues"] += int((counts**2).sum())
+    stats["num_crc_valid_slots"] += sum(report.get("crc_valid_slots", 0) for report in pass_report)
+    stats["num_undetected_errors"] += sum(report.get("undetected_errors", 0) for report in pass_report)
+
+def run_simulation_streaming(simulation_params, num_simulations, num_ues_per_frame, frame_size, probabilities, ebno_db, chunk_num_simulations, stats=None, profiler=None, seed=None):
+    """
+    Run the simulations chunk by chunk: every chunk of frames is generated, passed through the AWGN channel and
+    decoded, and its statistics are folded into running accumulators before the next chunk is generated.
+
+    The peak memory therefore depends on chunk_num_simulations and not on num_simulations.
+    With a seed, every chunk is drawn from its own streams of the seed tree (see get_rng_streams), the chunks
+    being numbered across successive calls sharing the same accumulators.
+
+    Args:
+        simulation_params: Dictionary containing all simulation parameters.
+        num_simulations: Number of simulations to run.
+        num_ues_per_frame: Number of UEs per frame.
+        frame_size: Total number of slots in the frame.
+        probabilities: Probabilities for selecting number of replicas.
+        ebno_db: The Eb/No value in dB.
+        chunk_num_simulations: Number of frames per chunk.
+        stats: Optional accumulators of previous runs to fold the statistics into.
+        profiler: Optional SimulationProfiler recording the time spent in each stage.
+        seed: Optional seed of the point, by default the global generators are used.
+
+    Returns:
+        stats: Dictionary with the running accumulators: the number of simulated frames, of identified UEs,
+               of missed UEs, the sum of the squared numbers of identified UEs per frame, the number of
+               decoded slots with a valid CRC and of undetected errors (CRC mode) and the number of chunks.
+    """
+    if stats is None:
+        stats = {"num_simulations": 0, "num_identified_ues": 0, "num_missed_ues": 0, "sum_squared_identified_ues": 0,
+                 "num_crc_valid_slots": 0, "num_undetected_errors": 0, "num_chunks": 0}
+
+    if is_phy_abstraction_enabled(simulation_params):
+        # The abstracted PHY only draws the slots of the UEs, every chunk is simulated by run_simulation
+        for first_simulation in range(0, num_simulations, chunk_num_simulations):
+            num_chunk_simulations = min(chunk_num_simulations, num_simulations - first_simulation)
+            rng_streams = get_rng_streams(seed, stats["num_chunks"]) if seed is not None else None
+            pass_report = []
+            identified_ues = run_simulation(simulation_params, num_chunk_simulations, num_ues_per_frame, frame_size, probabilities, ebno_db, pass_report, profiler, rng_streams)
+            fold_identified_ues(stats, identified_ues, num_chunk_simulations, num_ues_per_frame, pass_report)
+        return stats
+
+    frame_chunks = generate_hyper_irsa_frame_chunks(simulation_params, num_simulations, num_ues_per_frame, frame_size, probabilities, chunk_num_simulations, seed, stats["num_chunks"])
+    while True:
+        # Generate the next chunk of frames
+        with profile_stage(profiler, "frame_generation", chunk_num_simulations * frame_size):
+            chunk = next(frame_chunks, None)
+        if chunk is None:
+            break
+        num_chunk_simulations, (irsa_hyper_frame, resource_grids, h_ues, replica_map, bits) = chunk
+        del chunk
+
+        # Pass the chunk through the AWGN channel and decode it
+        noise_rng = get_rng_streams(seed, stats["num_chunks"])["noise"] if seed is not None else None
+        with profile_stage(profiler, "awgn", num_chunk_simulations * frame_size):
+            received_frame, no = pass_through_awgn(irsa_hyper_frame, ebno_db, simulation_params, noise_rng)
+        del irsa_hyper_frame
+        pass_report = []
+        identified_ues = decode_irsa_frame(received_frame, no, simulation_params, resource_grids, bits, replica_map, num_chunk_simulations, frame_size, num_ues_per_frame, h_ues, pass_report, profiler)
+        del received_frame, resource_grids, h_ues, bits
+
+        # Fold the statistics of the chunk into the accumulators
+        fold_identified_ues(stats, identified_ues, num_chunk_simulations, num_ues_per_frame, pass_report)
+
+    return stats
+
+def run_simulation_adaptive(simulation_params, num_ues_per_frame, frame_size, probabilities, ebno_db, batch_num_simulations, target_ci_width=None, max_num_simulations=None, max_num_errors=None, chunk_num_simulations=None, profiler=None, seed=None):
+    """
+    Run batches of frames until the 95% confidence interval of the number of identified UEs per frame
+    is narrower than the target width, or the maximum number of frames or of missed UEs is reached.
+
+    The confidence interval is built from the variance of the per-frame counts, with the Wilson interval as its
+    floor (see get_identified_ues_confidence_interval).
+    Without a maximum number of frames, a single batch is run.
+
+    Args:
+        simulation_params: Dictionary containing all simulation parameters.
+        num_ues_per_frame: Number of UEs per frame.
+        frame_size: Total number of slots in the frame.
+        probabilities: Probabilities for selecting number of replicas.
+        ebno_db: The Eb/No value in dB.
+        batch_num_simulations: Number of frames simulated per batch.
+        target_ci_width: Optional target width of the confidence interval, in UEs per frame.
+        max_num_simulations: Maximum number of frames, by default a single batch. Required with a target width
+                             or a maximum number of missed UEs.
+        max_num_errors: Optional maximum number of missed (not identified) UEs.
+        chunk_num_simulations: Optional number of frames generated at once (see run_simulation_streaming),
+                               by default a whole batch.
+        profiler: Optional SimulationProfiler recording the time spent in each stage.
+        seed: Optional seed of the point (see get_rng_streams), by default the global generators are used.
+
+    Returns:
+        stats: Dictionary with the number of simulated frames, the number of missed UEs, the average
+               number of (correctly) identified UEs per frame and its confidence interval, and the number
+               of decoded slots with a valid CRC and of undetected errors (zero without crc_polynomial).
+    """
+    if max_num_simulations is None:
+        if target_ci_width is not None or max_num_errors is not None:
+            raise ValueError("Adaptive stopping (target_ci_width or max_num_errors) requires max_num_simulations")
+        max_num_simulations = batch_num_simulations
+    if chunk_num_simulations is None:
+        chunk_num_simulations = batch_num_simulations
+    stats = None
+    while True:
+        num_simulations = min(batch_num_simulations, max_num_simulations - (stats["num_simulations"] if stats else 0))
+        stats = run_simulation_streaming(simulation_params, num_simulations, num_ues_per_frame, frame_size, probabilities, ebno_db, chunk_num_simulations, stats, profiler, seed)
+        mean = stats["num_identified_ues"] / stats["num_simulations"]
+        ci = get_identified_ues_confidence_interval(stats["num_simulations"], num_ues_per_frame, stats["num_identified_ues"], stats["sum_squared_identified_ues"])
+
+        if target_ci_width is not None and ci[1] - ci[0] <= target_ci_width:
+            break
+        if stats["num_simulations"] >= max_num_simulations:
+            break
+        if max_num_errors is not None and stats["num_missed_ues"] >= max_num_errors:
+            break
+
+    return {
+        "num_simulations": stats["num_simulations"],
+        "num_missed_ues": stats["num_missed_ues"],
+        "identified_ues_per_frame": mean,
+        "identified_ues_per_frame_ci": [float(ci[0]), float(ci[1])],
+        "num_crc_valid_slots": stats["num_crc_valid_slots"],
+        "num_undetected_errors": stats["num_undetected_errors"]
+    }
+
+def run_sweep_point(point):
+    """
+    Run the simulation of one sweep point.
+
+    Args:
+        point: Dictionary with the simulation_params, num_simulations, num_ues_per_frame, frame_size,
+               probabilities and ebno_db of the point, and optionally its seed (see get_rng_streams) and its adaptive stopping
+               parameters (target_ci_width, max_num_simulations, max_num_errors, chunk_num_simulations,
+               see run_simulation_adaptive),
+               in which case num_simulations is the number of frames per batch.
+
+    Returns:
+        result: Dictionary with the load, Eb/No and SIC mode of the point, the number of simulated frames,
+                the average number of identified UEs per frame with its 95% confidence interval, and the
+                number of decoded slots with a valid CRC and of undetected errors.
+    """
+    # The point draws all its random numbers from its own branch of the seed tree
+    stats = run_simulation_adaptive(point["simulation_params"], point["num_ues_per_frame"], point["frame_size"], point["probabilities"], point["ebno_db"],
+                                    point["num_simulations"], seed=point.get("seed"), **point.get("adaptive", {}))
+    return {
+        "num_ues_per_frame": point["num_ues_per_frame"],
+        "ebno_db": point["ebno_db"],
+        "is_perfect_SIC": point["simulation_params"]["Channel parameters"]["is_perfect_SIC"],
+        "num_simulations": stats["num_simulations"],
+        "identified_ues_per_frame": stats["identified_ues_per_frame"],
+        "identified_ues_per_frame_ci": stats["identified_ues_per_frame_ci"],
+        "num_crc_valid_slots": stats["num_crc_valid_slots"],
+        "num_undetected_errors": stats["num_undetected_errors"]
+    }
+
+# Version of the simulation code (the functions defined above) and of the results store, part of the key of
+# the stored results so that editing the simulation invalidates them, while editing the plotting cells does not
+CODE_VERSION = get_code_version(*get_simulation_code(globals()), irsa_results_store)
+
+def write_sweep_csv(results, file_path):
+    """
+    Write the results of a load sweep to a CSV file with the irsa_performance*.csv schema.
+
+    There is one row per load and one avg_decoded_<perfect|imperfect>_sic column per SIC mode in the results,
+    followed by the bounds of their 95% confidence intervals (<column>_ci_low and <column>_ci_high).
+    In the CRC identification mode, the numbers of decoded slots with a valid CRC and of undetected errors
+    follow (<column>_crc_valid_slots and <column>_undetected_errors), their ratio being the undetected error rate.
+
+    Args:
+        results: List of sweep results (see run_sweep_point) at the same Eb/No.
+        file_path: Path of the CSV file.
+    """
+    sic_modes = sorted({result["is_perfect_SIC"] for result in results}, reverse=True)
+    columns = ['avg_decoded_perfect_sic' if is_perfect_SIC else 'avg_decoded_imperfect_sic' for is_perfect_SIC in sic_modes]
+    ci_columns = [f'{column}_ci_{bound}' for column in columns for bound in ('low', 'high')]
+    crc_keys = ["num_crc_valid_slots", "num_undetected_errors"] if any(result.get("num_crc_valid_slots") for result in results) else []
+    crc_columns = [f'{column}_{key[4:]}' for column in columns for key in crc_keys]
+    rows = {}
+    for result in results:
+        rows.setdefault(result["num_ues_per_frame"], {})[result["is_perfect_SIC"]] = result
+
+    with open(file_path, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['num_users'] + columns + ci_columns + crc_columns)
+        for num_users in sorted(rows):
+            row_results = [rows[num_users].get(is_perfect_SIC) for is_perfect_SIC in sic_modes]
+            values = [result["identified_ues_per_frame"] if result else '' for result in row_results]
+            ci_values = [result["identified_ues_per_frame_ci"][bound] if result else '' for result in row_results for bound in (0, 1)]
+            crc_values = [result[key] if result else '' for result in row_results for key in crc_keys]
+            writer.writerow([num_users] + values + ci_values + crc_values)
+
 #%%
 # Simulation parameters
-simulation_params = {
-    "Carrier parameters": {
-        "num_resource_blocks": 1,
-        "numerology": 0,
-        "pilot_indices": [3, 9],
-        "num_ofdm_symbols": 14
-    },
-    "Transport block parameters": {
-        "num_bits_per_symbol": 2,
-        "coderate": 0.5
-    },
-    "Channel parameters": {
-        "is_phase_shift_applied": True,
-        "is_perfect_SIC": True
+if __name__ == "__main__":
+    simulation_params = {
+        "Carrier parameters": {
+            "num_resource_blocks": 1,
+            "numerology": 0,
+            "pilot_indices": [3, 9],
+            "num_ofdm_symbols": 14
+        },
+        "Transport block parameters": {
+            "num_bits_per_symbol": 2,
+            "coderate": 0.5
+        },
+        "Channel parameters": {
+            "is_phase_shift_applied": True,
+            "is_perfect_SIC": True
+        }
     }
-}
-# Number of UEs per frame
-num_ues_per_frame = 1
-# Number of simulations to run
-num_simulations = 10
-# Number of slots in the frame
-frame_size = 10
-# Probabilities for selecting number of replicas
-probabilities = [0, 0.3, 0.15, 0.55]
-# Eb/No value in dB
-ebno_db = 100
-
-# Run the simulation
-identified_ues = run_simulation(simulation_params, num_simulations, num_ues_per_frame, frame_size, probabilities, ebno_db)
-# Print the total number of ues and the identified ues
-num_ues = num_simulations * num_ues_per_frame
-print(f"\nTotal number of UEs: {num_ues}")
-print(f"Identified UEs: {len(identified_ues)}")
+    # Number of UEs per frame
+    num_ues_per_frame = 1
+    # Number of simulations to run
+    num_simulations = 10
+    # Number of slots in the frame
+    frame_size = 10
+    # Probabilities for selecting number of replicas
+    probabilities = [0, 0.3, 0.15, 0.55]
+    # Eb/No value in dB
+    ebno_db = 100
+
+    # Run the simulation
+    pass_report = []
+    identified_ues = run_simulation(simulation_params, num_simulations, num_ues_per_frame, frame_size, probabilities, ebno_db, pass_report)
+    # Print the total number of ues and the identified ues
+    num_ues = num_simulations * num_ues_per_frame
+    print(f"\nTotal number of UEs: {num_ues}")
+    print(f"Identified UEs: {len(identified_ues)}")
+    for pass_stats in pass_report:
+        print(f"Pass {pass_stats['pass']}: decoded slots: {pass_stats['decoded_slots']}, new identified UEs: {pass_stats['new_identified_ues']}")
+    print(f"Receiver chain cache: {receiver_chain_cache_stats['hits']} hits, {receiver_chain_cache_stats['misses']} misses")
 
 
 #%%
 # Plotting the performance of IRSA with varying number of UEs per frame
 # Simulation parameters
-simulation_params = {
-    "Carrier parameters": {
-        "num_resource_blocks": 1,
-        "numerology": 0,
-        "pilot_indices": [3, 9],
-        "num_ofdm_symbols": 14
-    },
-    "Transport block parameters": {
-        "num_bits_per_symbol": 2,
-        "coderate": 0.5
-    },
-    "Channel parameters": {
-        "is_phase_shift_applied": True,
-        "is_perfect_SIC": False
+if __name__ == "__main__":
+    simulation_params = {
+        "Carrier parameters": {
+            "num_resource_blocks": 1,
+            "numerology": 0,
+            "pilot_indices": [3, 9],
+            "num_ofdm_symbols": 14
+        },
+        "Transport block parameters": {
+            "num_bits_per_symbol": 2,
+            "coderate": 0.5
+        },
+        "Channel parameters": {
+            "is_phase_shift_applied": True,
+            "is_perfect_SIC": False
+        }
     }
-}
-# Number of simulations to run
-num_simulations = 1000
-# Number of slots in the frame
-frame_size = 15
-# Probabilities for selecting number of replicas
-probabilities = [0, 0.3, 0.15, 0.55]
-# Eb/No value in dB
-ebno_db = 10
-
-# Initialize lists to store results
-total_ues_per_frame_list = []
-identified_ues_per_frame_list = []
-
-# Open log file
-log_file_path = 'irsa_simulation_log.txt'
-with open(log_file_path, 'w') as log_file:
-    # Vary the number of UEs per frame from 1 to frame_size - 1
-    for num_ues_per_frame in range(1, frame_size+1):
-        # Run the simulation
-        identified_ues = run_simulation(simulation_params, num_simulations, num_ues_per_frame, frame_size, probabilities, ebno_db)
-        
-        # Total number of UEs per frame
-        total_ues_per_frame = num_ues_per_frame
-        total_ues_per_frame_list.append(total_ues_per_frame)
-        
-        # Number of identified UEs per frame
-        identified_ues_per_frame = len(identified_ues) / num_simulations
-        identified_ues_per_frame_list.append(identified_ues_per_frame)
-        
-        # Print and log the report
-        report = f"Number of UEs per Frame: {total_ues_per_frame}, Identified UEs per Frame: {identified_ues_per_frame}"
-        print(report)
-        log_file.write(report + '\n')
-
-# Plotting
-plt.figure(figsize=(10, 6))
-plt.plot(total_ues_per_frame_list, identified_ues_per_frame_list, 'bo-', label='Identified UEs per Frame')
-plt.xlabel('Total Number of UEs per Frame')
-plt.ylabel('Number of Identified UEs per Frame')
-plt.title('Performance of IRSA with Varying Number of UEs per Frame')
-plt.legend()
-plt.grid(True)
-plt.show()
+    # Number of simulations to run per batch
+    num_simulations = 100
+    # Adaptive stopping: batches are run until the 95% confidence interval of the identified UEs per frame
+    # is narrower than the target width, capped by a maximum number of frames
+    adaptive = {
+        "target_ci_width": 0.2,
+        "max_num_simulations": 4000
+    }
+    # Number of slots in the frame
+    frame_size = 15
+    # Probabilities for selecting number of replicas
+    probabilities = [0, 0.3, 0.15, 0.55]
+    # Eb/No value in dB
+    ebno_db = 10
+    # Root seed of the sweep, every load gets the seed [sweep_seed, num_ues_per_frame]
+    sweep_seed = 1
+
+    # Run the loads in parallel worker processes
+    sweep_points = [{
+        "simulation_params": simulation_params,
+        "num_simulations": num_simulations,
+        "num_ues_per_frame": num_ues_per_frame,
+        "frame_size": frame_size,
+        "probabilities": probabilities,
+        "ebno_db": ebno_db,
+        "adaptive": adaptive,
+        "seed": [sweep_seed, num_ues_per_frame]
+    } for num_ues_per_frame in range(1, frame_size+1)]
+    # Completed loads are cached in the store, so restarting or re-plotting the sweep only reads the stored loads
+    sweep_results = run_sweep_parallel(run_sweep_point, sweep_points, store_dir='irsa_sweep_store', max_store_size=64 * 2**20, code_version=CODE_VERSION)
+
+    # Initialize lists to store results
+    total_ues_per_frame_list = []
+    identified_ues_per_frame_list = []
+    identified_ues_per_frame_ci_list = []
+
+    # Open log file
+    log_file_path = 'irsa_simulation_log.txt'
+    with open(log_file_path, 'w') as log_file:
+        for result in sweep_results:
+            # Total number of UEs per frame
+            total_ues_per_frame = result["num_ues_per_frame"]
+            total_ues_per_frame_list.append(total_ues_per_frame)
+
+            # Number of identified UEs per frame
+            identified_ues_per_frame = result["identified_ues_per_frame"]
+            identified_ues_per_frame_list.append(identified_ues_per_frame)
+            ci_low, ci_high = result["identified_ues_per_frame_ci"]
+            identified_ues_per_frame_ci_list.append((identified_ues_per_frame - ci_low, ci_high - identified_ues_per_frame))
+
+            # Print and log the report
+            report = (f"Number of UEs per Frame: {total_ues_per_frame}, Identified UEs per Frame: {identified_ues_per_frame:.3f} "
+                      f"(95% CI [{ci_low:.3f}, {ci_high:.3f}], {result['num_simulations']} frames)")
+            print(report)
+            log_file.write(report + '\n')
+
+    # Plotting
+    plt.figure(figsize=(10, 6))
+    plt.errorbar(total_ues_per_frame_list, identified_ues_per_frame_list, yerr=np.array(identified_ues_per_frame_ci_list).T,
+                 fmt='bo-', capsize=3, label='Identified UEs per Frame (95% CI)')
+    plt.xlabel('Total Number of UEs per Frame')
+    plt.ylabel('Number of Identified UEs per Frame')
+    plt.title('Performance of IRSA with Varying Number of UEs per Frame')
+    plt.legend()
+    plt.grid(True)
+    plt.show()
 
 #%%
 # Save the statistics to a CSV file
-import csv
-from datetime import datetime
+if __name__ == "__main__":
+    from datetime import datetime
 
-# Get the current time
-current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Get the current time
+    current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-# File path with time
-file_path = f'irsa_performance_imperfect_SIC_{current_time}.csv'
+    # File path with time
+    file_path = f'irsa_performance_imperfect_SIC_{current_time}.csv'
 
-# Write the statistics to the CSV file
-with open(file_path, mode='w', newline='') as file:
-    writer = csv.writer(file)
-    
-    # Write the statistics
-    writer.writerow(['num_users', 'avg_decoded_imperfect_sic'])
-    for i in range(len(total_ues_per_frame_list)):
-        writer.writerow([total_ues_per_frame_list[i], identified_ues_per_frame_list[i]])
-        
-print(f"Statistics saved to {file_path}")
+    # Write the statistics to the CSV file
+    write_sweep_csv(sweep_results, file_path)
+
+    print(f"Statistics saved to {file_path}")
+
+
+#%%
+# Benchmark the single-shot hyper frame builder against the per-UE loop
+if __name__ == "__main__":
+    simulation_params = {
+        "Carrier parameters": {
+            "num_resource_blocks": 1,
+            "numerology": 0,
+            "pilot_indices": [3, 9],
+            "num_ofdm_symbols": 14
+        },
+        "Transport block parameters": {
+            "num_bits_per_symbol": 2,
+            "coderate": 0.5
+        },
+        "Channel parameters": {
+            "is_phase_shift_applied": True,
+            "is_perfect_SIC": True
+        }
+    }
+    num_simulations = 100
+    frame_size = 15
+    num_ues_per_frame = 10
+    probabilities = [0, 0.3, 0.15, 0.55]
+    batch_size = num_simulations * frame_size
+
+    resource_grids, bits = generate_ues(simulation_params, num_ues_per_frame, num_simulations)
+    replica_map = generate_slot_indices(num_simulations, num_ues_per_frame, frame_size, probabilities)
+    angles, channel_coeff = generate_channel(simulation_params, num_simulations, num_ues_per_frame, replica_map, True)
+
+    start_time = time.perf_counter()
+    frame_per_ue = build_hyper_irsa_frame_per_ue(resource_grids, channel_coeff, replica_map, batch_size)
+    time_per_ue = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    frame_single_shot = build_hyper_irsa_frame(resource_grids, channel_coeff, replica_map, batch_size)
+    time_single_shot = time.perf_counter() - start_time
+
+    print(f"Per-UE loop: {time_per_ue:.3f} s, single shot: {time_single_shot:.3f} s, speedup: {time_per_ue / time_single_shot:.1f}x")
+    print(f"Bit-identical frames: {np.array_equal(frame_per_ue.numpy(), frame_single_shot.numpy())}")
+
+#%%
+# Benchmark the vectorized slot index generator
+if __name__ == "__main__":
+    num_ues = 10**6
+    frame_size = 15
+    probabilities = [0, 0.3, 0.15, 0.55]
+
+    start_time = time.perf_counter()
+    replica_map = generate_slot_indices(num_ues, 1, frame_size, probabilities)
+    print(f"Slot indices of {num_ues} UEs generated in {time.perf_counter() - start_time:.3f} s, replica map of {replica_map.nbytes / 2**20:.1f} MiB")
+
+    # Both directions of the map agree: every replica is listed in the inverse index of its slot
+    slots = np.arange(0, replica_map.num_slots, 997)
+    slot_replica_positions = replica_map.get_slot_replica_positions(slots)
+    assert np.array_equal(np.repeat(slots, replica_map.slot_counts[slots]), replica_map.slot_ids[slot_replica_positions])
+    ues = np.arange(0, num_ues, 991)
+    assert np.array_equal(replica_map.ordinals[replica_map.get_replica_positions(ues)], np.concatenate([np.arange(count) for count in replica_map.replica_counts[ues]]))
+
+#%%
+# Profile the stages of one simulation
+if __name__ == "__main__":
+    profiler = SimulationProfiler(keep_trace=True)
+    identified_ues = run_simulation(simulation_params, 100, 10, 15, [0, 0.3, 0.15, 0.55], 10, profiler=profiler)
+    profile_report = profiler.report()
+    for stage_name, stage_stats in profile_report["stages"].items():
+        print(f"{stage_name}: {stage_stats['time_s']:.3f} s, {stage_stats['calls']} calls, {stage_stats['slots_per_s']:.0f} slots/s")
+    profiler.write_trace('irsa_profile_trace.jsonl')
+
+#%%
+# Benchmark the eager, graph and XLA receivers on CPU
+if __name__ == "__main__":
+    num_simulations = 100
+    num_ues_per_frame = 3
+    frame_size = 15
+    probabilities = [0, 0.3, 0.15, 0.55]
+    irsa_hyper_frame, resource_grids, h_ues, replica_map, bits = generate_hyper_irsa_frame(simulation_params, num_simulations, num_ues_per_frame, frame_size, probabilities)
+    received_frame, no = pass_through_awgn(irsa_hyper_frame, 10, simulation_params)
+
+    for execution_mode in ["eager", "graph", "xla"]:
+        receiver_simulation_params = dict(simulation_params, **{"Receiver parameters": {"execution_mode": execution_mode}})
+        # Warm up (trace and compile) on every bucket used below
+        for num_slots in [1500, 200, 40]:
+            decode_frame(received_frame[:num_slots], no, receiver_simulation_params)
+        start_time = time.perf_counter()
+        for num_slots in [1500, 200, 40]:
+            decode_frame(received_frame[:num_slots], no, receiver_simulation_params)
+        elapsed_time = time.perf_counter() - start_time
+        print(f"{execution_mode}: {1740 / elapsed_time:.0f} slots/s, traces so far: {receiver_trace_stats['traces']}")
+
+#%%
+# Run a large number of frames in chunks with bounded memory
+if __name__ == "__main__":
+    num_simulations = 10000
+    chunk_num_simulations = 500
+    start_time = time.perf_counter()
+    stream_stats = run_simulation_streaming(simulation_params, num_simulations, 10, 15, [0, 0.3, 0.15, 0.55], 10, chunk_num_simulations)
+    print(f"{stream_stats['num_simulations']} frames in {time.perf_counter() - start_time:.1f} s, "
+          f"identified UEs per frame: {stream_stats['num_identified_ues'] / stream_stats['num_simulations']:.3f}")
+
+#%%
+# Benchmark the transmitter with and without the pre-encoded codeword pool
+if __name__ == "__main__":
+    num_ues = 20000
+    pool_simulation_params = dict(simulation_params, **{"Transport block parameters": dict(simulation_params["Transport block parameters"], codeword_pool_size=4096)})
+    get_codeword_pool(pool_simulation_params)
+
+    for name, transmitter_params in [("encoder", simulation_params), ("codeword pool", pool_simulation_params)]:
+        start_time = time.perf_counter()
+        resource_grids, bits = generate_ues(transmitter_params, num_ues, 1)
+        print(f"{name}: {num_ues / (time.perf_counter() - start_time):.0f} UEs/s")
+
+#%%
+# Validate the PHY abstraction (BLER table) against the full PHY
+if __name__ == "__main__":
+    abstraction_simulation_params = dict(simulation_params, **{"PHY abstraction parameters": {
+        "is_enabled": True,
+        "table_dir": "bler_tables",
+        "num_blocks": 1000
+    }})
+    validation = validate_phy_abstraction(abstraction_simulation_params, 200, [3, 6, 9, 12, 15], 15, [0, 0.3, 0.15, 0.55], 10)
+    for point_validation in validation:
+        print(f"{point_validation['num_ues_per_frame']} UEs per frame: "
+              f"full PHY {point_validation['full_identified_ues_per_frame']:.3f} ({point_validation['full_time_s']:.1f} s), "
+              f"abstracted {point_validation['abstracted_identified_ues_per_frame']:.3f} ({point_validation['abstracted_time_s']:.2f} s)")
+
+#%%
+# Check that any chunk of a seeded run can be regenerated on its own
+if __name__ == "__main__":
+    frame_chunks = list(generate_hyper_irsa_frame_chunks(simulation_params, 40, 5, 15, [0, 0.3, 0.15, 0.55], 10, seed=[1, 5]))
+    regenerated_chunk = generate_hyper_irsa_frame(simulation_params, 10, 5, 15, [0, 0.3, 0.15, 0.55], get_rng_streams([1, 5], 2))
+    assert np.array_equal(frame_chunks[2][1][0].numpy(), regenerated_chunk[0].numpy())
+    assert not np.array_equal(frame_chunks[1][1][0].numpy(), regenerated_chunk[0].numpy())
+    print("Chunk 2 regenerated in isolation")
+
+#%%
+# CRC identification mode: identify the UEs from the CRC and the header of the decoded slots, and count the undetected errors
+if __name__ == "__main__":
+    num_simulations = 200
+    num_ues_per_frame = 10
+    for crc_polynomial in [None, "CRC6", "CRC16"]:
+        crc_simulation_params = dict(simulation_params, **{"Transport block parameters": dict(simulation_params["Transport block parameters"], crc_polynomial=crc_polynomial)})
+        crc_pass_report = []
+        start_time = time.perf_counter()
+        identified_ues = run_simulation(crc_simulation_params, num_simulations, num_ues_per_frame, 15, [0, 0.3, 0.15, 0.55], 10,
+                                        pass_report=crc_pass_report, rng_streams=get_rng_streams([1, num_ues_per_frame]))
+        elapsed_time = time.perf_counter() - start_time
+        num_decoded_slots = sum(report["decoded_slots"] for report in crc_pass_report)
+        num_crc_valid_slots = sum(report.get("crc_valid_slots", 0) for report in crc_pass_report)
+        num_undetected_errors = sum(report.get("undetected_errors", 0) for report in crc_pass_report)
+        print(f"{crc_polynomial or 'Genie'}: {len(identified_ues) / num_simulations:.3f} correctly identified UEs per frame, "
+              f"{num_undetected_errors} undetected errors among {num_crc_valid_slots} slots with a valid CRC, "
+              f"{num_decoded_slots} decoded slots ({elapsed_time:.1f} s)")
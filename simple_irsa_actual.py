@@ -17,6 +17,7 @@ import matplotlib.pyplot as plt
 
 # for performance measurements
 import time
+from math import comb
 
 # Importing the required classes from the sionna library
 from sionna.mapping import Constellation, Mapper, Demapper
@@ -27,6 +28,9 @@ from sionna.signal import Upsampling, Downsampling, RootRaisedCosineFilter, empi
 import os
 import json
 
+import irsa_results_store
+from irsa_results_store import get_code_version, get_simulation_code, memoize_point
+
 
 #%%
 # Distributions for degree selection: the degree always starts from 0 
@@ -53,11 +57,14 @@ np_sol_dist = get_soliton_np(30, 0.02)
 d3_dist = [0,0,0,1] # degree always 3
 d2_dist = [0,0,1] # degree always 2
 
-def generate_slots_of_users(N,M,lambda_dist):
+def generate_slots_of_users(N,M,lambda_dist,rng=None):
     """N nodes select a number of slots of the frame of size M:
-    return a list of N sub-lists which indicate the slots selected by each user """
-    d_array = np.random.choice(np.arange(len(lambda_dist)), size=N, p=lambda_dist)
-    slot_of_frame_choice_matrix = np.random.uniform(size=(N,M)).argsort()
+    return a list of N sub-lists which indicate the slots selected by each user.
+    The slots are drawn from the `rng` np.random.Generator, by default from the global generator"""
+    if rng is None:
+        rng = np.random
+    d_array = rng.choice(np.arange(len(lambda_dist)), size=N, p=lambda_dist)
+    slot_of_frame_choice_matrix = rng.uniform(size=(N,M)).argsort()
     frame_choice_array = ((np.arange(0,N) // N)*M ).reshape(-1,1)
     slot_choice_matrix = slot_of_frame_choice_matrix+frame_choice_array
     slot_choice_list = [ list(slot_choice_matrix[i,0:d_array[i]]) for i in range(N)]
@@ -65,10 +72,11 @@ def generate_slots_of_users(N,M,lambda_dist):
 
 #%%
 
-def decode_irsa(slots_of_users, M):
+def decode_irsa(slots_of_users, M, return_iteration=False):
     """ Given a frame of size `M`, 
     and a list `slots_of_users` that gives for each user, the list of the slots where it transmits
     -> perform the IRSA decoding.
+    If `return_iteration` is True, also return the iteration at which each user was decoded.
     """
     users_of_slots = [ set() for i in range(M) ]
     decoded_set = set()
@@ -105,7 +113,63 @@ def decode_irsa(slots_of_users, M):
         decoded_set = new_decoded_set
         nb_iter += 1
 
-    return decoded_set #, decoded_iteration #, users_of_slots
+    if return_iteration:
+        return decoded_set, decoded_iteration
+    return decoded_set #, users_of_slots
+
+def build_incidence_csr(slots_of_users, M):
+    """ Build the user/slot bipartite graph of a frame of size `M` as CSR index arrays:
+    the slots of user `u` are `user_slots[user_ptr[u]:user_ptr[u+1]]`
+    and the users of slot `m` are `slot_users[slot_ptr[m]:slot_ptr[m+1]]`.
+    The slots of a user are assumed to be distinct.
+    """
+    user_degrees = np.array([len(slot_list) for slot_list in slots_of_users], dtype=np.int64)
+    user_ptr = np.zeros(len(slots_of_users) + 1, dtype=np.int64)
+    np.cumsum(user_degrees, out=user_ptr[1:])
+    user_slots = np.array([i for slot_list in slots_of_users for i in slot_list], dtype=np.int64)
+    
+    edge_users = np.repeat(np.arange(len(slots_of_users)), user_degrees)
+    slot_users = edge_users[np.argsort(user_slots, kind="stable")]
+    slot_ptr = np.zeros(M + 1, dtype=np.int64)
+    np.cumsum(np.bincount(user_slots, minlength=M), out=slot_ptr[1:])
+    return user_ptr, user_slots, slot_ptr, slot_users
+
+def decode_irsa_csr(slots_of_users, M):
+    """ Same IRSA decoding as `decode_irsa`, on the CSR representation of the frame.
+    Each slot keeps the number of its still unknown users and the sum of their indices,
+    so the user of a degree-1 slot is read directly from the sum.
+    The degree-1 slots are peeled iteration by iteration from a work queue,
+    in O(number of edges) per frame.
+    Return the decoded set and the iteration at which each user was decoded.
+    """
+    user_ptr, user_slots, slot_ptr, slot_users = build_incidence_csr(slots_of_users, M)
+    user_ptr = user_ptr.tolist()
+    user_slots = user_slots.tolist()
+    slot_degree = np.diff(slot_ptr).tolist()
+    slot_user_sum = np.bincount(np.repeat(np.arange(M), np.diff(slot_ptr)), weights=slot_users, minlength=M).astype(np.int64).tolist()
+    decoded_iteration = {}
+    
+    queue = [i for i in range(M) if slot_degree[i] == 1]
+    nb_iter = 0
+    while len(queue) > 0:
+        # decode the users of all the degree-1 slots of this iteration
+        new_decoded_users = []
+        for i in queue:
+            new_decoded_user = slot_user_sum[i]
+            if new_decoded_user not in decoded_iteration:
+                decoded_iteration[new_decoded_user] = nb_iter
+                new_decoded_users.append(new_decoded_user)
+        # remove them from their slots (SIC)
+        touched_slots = []
+        for user_idx in new_decoded_users:
+            for i in user_slots[user_ptr[user_idx]:user_ptr[user_idx+1]]:
+                slot_degree[i] -= 1
+                slot_user_sum[i] -= user_idx
+                touched_slots.append(i)
+        queue = [i for i in dict.fromkeys(touched_slots) if slot_degree[i] == 1]
+        nb_iter += 1
+
+    return set(decoded_iteration), decoded_iteration
 #%%
 np.random.seed(1)
 # 7 users transmitting in 10 slots with degree 2
@@ -117,6 +181,24 @@ slots_of_users = generate_slots_of_users(N, M, lambda_dist)
 decoded_set = decode_irsa(slots_of_users, M)
 print("N={N} M={M} decoded={decoded_set}".format(N=N, M=M, decoded_set=decoded_set))
 
+#%%
+# Check that the CSR decoder gives the same result as decode_irsa on random frames
+for trial in range(1000):
+    M = np.random.randint(1, 30)
+    N = np.random.randint(0, 2*M)
+    slots_of_users = generate_slots_of_users(N, M, [0, 0.3, 0.15, 0.55])
+    assert decode_irsa_csr(slots_of_users, M) == decode_irsa(slots_of_users, M, return_iteration=True)
+
+N, M = 9000, 10000
+slots_of_users = generate_slots_of_users(N, M, [0, 0.3, 0.15, 0.55])
+start_time = time.perf_counter()
+decode_irsa(slots_of_users, M)
+time_sets = time.perf_counter() - start_time
+start_time = time.perf_counter()
+decode_irsa_csr(slots_of_users, M)
+time_csr = time.perf_counter() - start_time
+print("decode_irsa: %.3f s, decode_irsa_csr: %.3f s for N=%d M=%d" % (time_sets, time_csr, N, M))
+
 #%%
 
 def simul_nb_decoded(N, M, L, lambda_dist):
@@ -125,26 +207,396 @@ def simul_nb_decoded(N, M, L, lambda_dist):
     nb_decoded_list = []
     for simul_idx in range(L):
         slots_of_users = generate_slots_of_users(N, M, lambda_dist)
-        decoded_users = decode_irsa(slots_of_users, M)
+        decoded_users, _ = decode_irsa_csr(slots_of_users, M)
         nb_decoded_list.append(len(decoded_users))
     return np.array(nb_decoded_list).mean()
 
 avg_decoded = simul_nb_decoded(90, 100, 10, [0,0,1])
 print("avg decoded=%s" %avg_decoded, " for 10 trials with N=90 M=100 degree=2"  )
 
+#%%
+
+def generate_incidence_batch(N, M, L, lambda_dist, rng=None):
+    """Generate `L` frames where `N` users select slots of a frame of size `M`, drawn from the `rng`
+    np.random.Generator (by default from the global generator):
+    return a boolean incidence tensor of shape [L, N, M], True when the user transmits in the slot"""
+    if rng is None:
+        rng = np.random
+    d_array = rng.choice(np.arange(len(lambda_dist)), size=(L, N), p=lambda_dist)
+    slot_rank = rng.uniform(size=(L, N, M)).argsort(axis=2).argsort(axis=2)
+    return slot_rank < d_array[:, :, np.newaxis]
+
+def decode_irsa_batch(incidence):
+    """ Perform the IRSA decoding of all the frames of the [L, N, M] boolean `incidence` tensor
+    simultaneously: at each iteration every user alone (among the unknown users) in a slot is decoded,
+    as in `decode_irsa`. The frames that make no progress are dropped from the next iterations.
+    Return the [L, N] boolean tensor of the decoded users.
+    """
+    L, N, M = incidence.shape
+    unknown = np.ones((L, N), dtype=bool)
+    active_frames = np.arange(L)
+    while len(active_frames) > 0:
+        active_edges = incidence[active_frames] & unknown[active_frames, :, np.newaxis]
+        singleton_slots = active_edges.sum(axis=1) == 1
+        new_decoded = (active_edges & singleton_slots[:, np.newaxis, :]).any(axis=2)
+        progress = new_decoded.any(axis=1)
+        unknown[active_frames] &= ~new_decoded
+        active_frames = active_frames[progress]
+    return ~unknown
+
+def simul_nb_decoded_batched(N, M, L, lambda_dist, rng=None):
+    """Same as `simul_nb_decoded`, with the `L` frames decoded at once"""
+    incidence = generate_incidence_batch(N, M, L, lambda_dist, rng)
+    return decode_irsa_batch(incidence).sum(axis=1).mean()
+
+# Check that the batched decoder gives the same result as decode_irsa_csr frame by frame
+incidence = generate_incidence_batch(12, 15, 500, [0, 0.3, 0.15, 0.55])
+decoded = decode_irsa_batch(incidence)
+for l in range(len(incidence)):
+    slots_of_users = [list(np.flatnonzero(user_row)) for user_row in incidence[l]]
+    decoded_set, _ = decode_irsa_csr(slots_of_users, incidence.shape[2])
+    assert decoded_set == set(np.flatnonzero(decoded[l]))
+
+#%%
+# Imperfect SIC: residual-interference model calibrated with p06 (`fit_residual_interference_model`)
+
+def load_residual_interference_model(file_path):
+    """Load the residual-interference model saved by p06"""
+    with open(file_path) as f:
+        return json.load(f)
+
+def get_residual_power(model, num_cancelled):
+    """Residual interference power of slots where `num_cancelled` replicas were cancelled:
+    interpolated in the table of the `model`, extrapolated beyond it with the residual power per cancellation"""
+    num_cancelled_values = np.array(model["num_cancelled_values"])
+    residual_power_values = np.array(model["residual_power_values"])
+    num_cancelled = np.asarray(num_cancelled)
+    residual_power = np.interp(num_cancelled, num_cancelled_values, residual_power_values)
+    extrapolated = residual_power_values[-1] + (num_cancelled - num_cancelled_values[-1]) * model["residual_power_per_cancellation"]
+    return np.where(num_cancelled > num_cancelled_values[-1], extrapolated, residual_power)
+
+def decode_irsa_imperfect_sic(slots_of_users, M, model, residual_threshold=None):
+    """ Same IRSA decoding as `decode_irsa_csr`, with imperfect SIC: every cancelled replica leaves
+    residual interference in its slot. The residual power accumulated by a slot is given by the `model` for
+    its number of cancelled replicas, and a degree-1 slot is decodable only while its residual power is
+    below `residual_threshold` (by default the decoding threshold of the model).
+    Return the decoded set and the iteration at which each user was decoded.
+    """
+    if residual_threshold is None:
+        residual_threshold = model["decoding_threshold"]
+    user_ptr, user_slots, slot_ptr, slot_users = build_incidence_csr(slots_of_users, M)
+    # residual power after 0, 1, 2, ... cancellations
+    is_decodable_after = (get_residual_power(model, np.arange(len(slots_of_users) + 1)) <= residual_threshold).tolist()
+    user_ptr = user_ptr.tolist()
+    user_slots = user_slots.tolist()
+    slot_degree = np.diff(slot_ptr).tolist()
+    slot_user_sum = np.bincount(np.repeat(np.arange(M), np.diff(slot_ptr)), weights=slot_users, minlength=M).astype(np.int64).tolist()
+    slot_cancelled = [0] * M
+    decoded_iteration = {}
+    
+    queue = [i for i in range(M) if slot_degree[i] == 1 and is_decodable_after[0]]
+    nb_iter = 0
+    while len(queue) > 0:
+        # decode the users of all the decodable degree-1 slots of this iteration
+        new_decoded_users = []
+        for i in queue:
+            new_decoded_user = slot_user_sum[i]
+            if new_decoded_user not in decoded_iteration:
+                decoded_iteration[new_decoded_user] = nb_iter
+                new_decoded_users.append(new_decoded_user)
+        # remove them from their slots (SIC), leaving residual interference
+        touched_slots = []
+        for user_idx in new_decoded_users:
+            for i in user_slots[user_ptr[user_idx]:user_ptr[user_idx+1]]:
+                slot_degree[i] -= 1
+                slot_user_sum[i] -= user_idx
+                slot_cancelled[i] += 1
+                touched_slots.append(i)
+        queue = [i for i in dict.fromkeys(touched_slots) if slot_degree[i] == 1 and is_decodable_after[slot_cancelled[i]]]
+        nb_iter += 1
+
+    return set(decoded_iteration), decoded_iteration
+
+def decode_irsa_batch_imperfect_sic(incidence, model, residual_threshold=None):
+    """ Same IRSA decoding as `decode_irsa_batch`, with the imperfect SIC of `decode_irsa_imperfect_sic`:
+    a slot alone (among the unknown users) is decodable only while the residual power left by its
+    cancelled replicas is below `residual_threshold`.
+    Return the [L, N] boolean tensor of the decoded users.
+    """
+    if residual_threshold is None:
+        residual_threshold = model["decoding_threshold"]
+    L, N, M = incidence.shape
+    is_decodable_after = get_residual_power(model, np.arange(N + 1)) <= residual_threshold
+    unknown = np.ones((L, N), dtype=bool)
+    active_frames = np.arange(L)
+    while len(active_frames) > 0:
+        active_edges = incidence[active_frames] & unknown[active_frames, :, np.newaxis]
+        num_cancelled = incidence[active_frames].sum(axis=1) - active_edges.sum(axis=1)
+        decodable_slots = (active_edges.sum(axis=1) == 1) & is_decodable_after[num_cancelled]
+        new_decoded = (active_edges & decodable_slots[:, np.newaxis, :]).any(axis=2)
+        progress = new_decoded.any(axis=1)
+        unknown[active_frames] &= ~new_decoded
+        active_frames = active_frames[progress]
+    return ~unknown
+
+def simul_nb_decoded_imperfect_sic_batched(N, M, L, lambda_dist, model, residual_threshold=None, rng=None):
+    """Same as `simul_nb_decoded_batched`, with the imperfect SIC of `decode_irsa_batch_imperfect_sic`"""
+    incidence = generate_incidence_batch(N, M, L, lambda_dist, rng)
+    return decode_irsa_batch_imperfect_sic(incidence, model, residual_threshold).sum(axis=1).mean()
+
+# Check the imperfect SIC decoders: without residual they reduce to perfect SIC,
+# and the batched decoder gives the same result as the CSR decoder frame by frame
+no_residual_model = {"num_cancelled_values": [0, 1], "residual_power_values": [0, 0],
+                     "residual_power_per_cancellation": 0, "decoding_threshold": 0}
+test_model = {"num_cancelled_values": [0, 1, 2], "residual_power_values": [0, 0.05, 0.12],
+              "residual_power_per_cancellation": 0.06, "decoding_threshold": 0.1}
+incidence = generate_incidence_batch(12, 15, 500, [0, 0.3, 0.15, 0.55])
+assert (decode_irsa_batch_imperfect_sic(incidence, no_residual_model) == decode_irsa_batch(incidence)).all()
+decoded = decode_irsa_batch_imperfect_sic(incidence, test_model)
+for l in range(len(incidence)):
+    slots_of_users = [list(np.flatnonzero(user_row)) for user_row in incidence[l]]
+    decoded_set, _ = decode_irsa_imperfect_sic(slots_of_users, incidence.shape[2], test_model)
+    assert decoded_set == set(np.flatnonzero(decoded[l]))
+
+#%%
+# Density evolution: asymptotic IRSA performance of a degree distribution Lambda (N, M -> infinity with G = N/M)
+
+def get_edge_distribution(lambda_dist):
+    """From the user degree distribution `lambda_dist` (Lambda_d = probability of degree d),
+    return the average degree Lambda'(1) and the edge-perspective distribution lambda_d = d Lambda_d / Lambda'(1)"""
+    lambda_dist = np.asarray(lambda_dist, dtype=float)
+    degrees = np.arange(len(lambda_dist))
+    avg_degree = (degrees * lambda_dist).sum()
+    return avg_degree, degrees * lambda_dist / avg_degree
+
+def density_evolution(lambda_dist, G, M=None, max_iter=10000, tol=1e-9):
+    """ Run the density evolution of the IRSA decoding for the loads `G` (a scalar or an array, evaluated at once):
+        q_i = 1 - exp(-G Lambda'(1) p_{i-1}) (a slot-to-user edge is still unknown)
+        p_i = lambda(q_i) (a user-to-slot edge is still unknown), with p_0 = 1.
+    Iterate until all the loads have converged (p below `tol`, or a relative change below `tol` at a
+    non-zero fixed point) or `max_iter` iterations.
+    If the frame size `M` is given, add the finite-length error floor (`error_floor_approximation`) with N = G M users.
+    Return the [nb_iter+1, len(G)] erasure probabilities p_i of every iteration
+    and the packet loss rate Lambda(q) of every load.
+    """
+    G = np.atleast_1d(np.asarray(G, dtype=float))
+    avg_degree, edge_dist = get_edge_distribution(lambda_dist)
+    lambda_poly = np.polynomial.Polynomial(np.asarray(lambda_dist, dtype=float))
+    edge_poly = np.polynomial.Polynomial(edge_dist[1:]) # lambda(x) = sum_d lambda_d x^{d-1}
+    
+    p = np.ones_like(G)
+    q = np.ones_like(G)
+    p_iterations = [p]
+    for nb_iter in range(max_iter):
+        q = 1 - np.exp(-G * avg_degree * p)
+        new_p = edge_poly(q)
+        p_iterations.append(new_p)
+        converged = (new_p < tol) | (np.abs(new_p - p) <= tol * new_p)
+        p = new_p
+        if converged.all():
+            break
+    packet_loss = lambda_poly(q)
+    if M is not None:
+        packet_loss = packet_loss + error_floor_approximation(lambda_dist, G * M, M)
+    return np.array(p_iterations), packet_loss
+
+def error_floor_approximation(lambda_dist, N, M):
+    """ Finite-length error floor of the packet loss rate for `N` users in a frame of `M` slots,
+    from the dominant stopping sets: two users of the same degree d >= 2 selecting the same d slots,
+        P_floor = sum_d Lambda_d (N-1) Lambda_d / C(M, d)
+    """
+    N = np.asarray(N, dtype=float)
+    floor = np.zeros_like(N)
+    for d, lambda_d in enumerate(lambda_dist):
+        if d >= 2 and d <= M and lambda_d > 0:
+            floor = floor + lambda_d * np.maximum(N - 1, 0) * lambda_d / comb(M, d)
+    return floor
+
+def de_threshold(lambda_dist, target_packet_loss=None, G_max=1.0, precision=1e-4, nb_points=32, tol=1e-9):
+    """ Asymptotic load threshold G* of `lambda_dist`: the largest load for which the density evolution
+    converges to p = 0. With degree-1 users p never reaches 0: give a `target_packet_loss` to get instead
+    the largest load for which the asymptotic packet loss rate is below the target.
+    The bracket [0, `G_max`] is refined by a vectorized bisection: the density evolution is run at once
+    on `nb_points` loads of the bracket, which is narrowed to the last load below the threshold
+    and the next one, until it is narrower than `precision`.
+    """
+    G_low, G_high = 0.0, G_max
+    while G_high - G_low > precision:
+        G = np.linspace(G_low, G_high, nb_points + 2)[1:-1]
+        p_iterations, packet_loss = density_evolution(lambda_dist, G, tol=tol)
+        if target_packet_loss is not None:
+            below_threshold = packet_loss <= target_packet_loss
+        else:
+            below_threshold = p_iterations[-1] < tol
+        nb_below = np.argmin(below_threshold) if not below_threshold.all() else nb_points
+        if nb_below > 0:
+            G_low = G[nb_below - 1]
+        if nb_below < nb_points:
+            G_high = G[nb_below]
+    return G_low
+
+# Thresholds of the example distributions (degree 2 is known to have G* = 1/2),
+# and load at which the packet loss rate reaches 1e-2 for the distributions with degree-1 users
+start_time = time.perf_counter()
+for name, dist in [("d2", d2_dist), ("d3", d3_dist), ("l3", l3_dist), ("np soliton", np_sol_dist)]:
+    print("%s: G* = %.4f" % (name, de_threshold(dist)))
+for name, dist in [("soliton", truc_sol_dist), ("[0, 0.3, 0.15, 0.55]", [0, 0.3, 0.15, 0.55])]:
+    print("%s: G(PL = 1e-2) = %.4f" % (name, de_threshold(dist, target_packet_loss=1e-2)))
+print("thresholds computed in %.3f s" % (time.perf_counter() - start_time))
+assert abs(de_threshold(d2_dist) - 0.5) < 1e-3
+
+# Packet loss rate on a load grid, with the error floor of a frame of 15 slots
+G_grid = np.linspace(0.05, 1, 20)
+_, packet_loss = density_evolution([0, 0.3, 0.15, 0.55], G_grid, M=15)
+print("throughput G (1 - PL):", np.round(G_grid * (1 - np.minimum(packet_loss, 1)), 3))
+
+#%%
+# Degree distribution optimizer: density evolution screening, then batched peeling refinement
+
+def sample_degree_distributions(nb_candidates, max_degree, max_avg_degree, rng=None):
+    """Draw `nb_candidates` degree distributions uniformly on the simplex of the degrees 1..`max_degree`,
+    keeping those whose average degree (the number of replicas, i.e. the energy per user) is at most `max_avg_degree`.
+    The distributions are drawn from the `rng` np.random.Generator, by default from the global generator.
+    Return a [K, max_degree+1] array (the probability of degree 0 is always 0)"""
+    if rng is None:
+        rng = np.random
+    candidates = np.zeros((0, max_degree + 1))
+    while len(candidates) < nb_candidates:
+        draws = rng.dirichlet(np.ones(max_degree), size=nb_candidates)
+        draws = draws[draws @ np.arange(1, max_degree + 1) <= max_avg_degree]
+        candidates = np.vstack([candidates, np.hstack([np.zeros((len(draws), 1)), draws])])
+    return candidates[:nb_candidates]
+
+def screen_degree_distributions(candidates, M, G_grid, max_iter=200):
+    """ Coarse screening of the [K, D] `candidates` with the density evolution (`density_evolution`)
+    run for all the candidates and all the loads of `G_grid` at once, with `max_iter` iterations,
+    plus the error floor of a frame of `M` slots.
+    Return the [K] estimated peak throughput max_G G (1 - PL(G)) of every candidate."""
+    degrees = np.arange(candidates.shape[1])
+    avg_degree = candidates @ degrees
+    edge_dist = candidates * degrees / avg_degree[:, np.newaxis]
+    G = np.asarray(G_grid, dtype=float)[np.newaxis, :]
+    
+    p = np.ones((len(candidates), G.shape[1]))
+    for nb_iter in range(max_iter):
+        q = 1 - np.exp(-G * avg_degree[:, np.newaxis] * p)
+        # p = lambda(q) = sum_d lambda_d q^{d-1}
+        p = np.einsum('kgd,kd->kg', q[:, :, np.newaxis] ** np.maximum(degrees - 1, 0), edge_dist)
+    packet_loss = np.einsum('kgd,kd->kg', q[:, :, np.newaxis] ** degrees, candidates)
+    
+    # error floor of `error_floor_approximation` for N = G M users
+    floor_weights = np.array([1 / comb(M, d) if 2 <= d <= M else 0 for d in degrees])
+    packet_loss = packet_loss + np.maximum(G * M - 1, 0) * ((candidates ** 2) @ floor_weights)[:, np.newaxis]
+    return (G * (1 - np.minimum(packet_loss, 1))).max(axis=1)
+
+def generate_incidence_batch_candidates(N, M, L, candidates, rng=None):
+    """Same as `generate_incidence_batch` for each of the [K, D] `candidates` distributions:
+    return a boolean incidence tensor of shape [K*L, N, M], the frames of candidate k being [k*L:(k+1)*L]"""
+    if rng is None:
+        rng = np.random
+    cumulative = np.cumsum(candidates, axis=1)
+    cumulative[:, -1] = 1
+    d_array = (rng.uniform(size=(len(candidates), L, N, 1)) > cumulative[:, np.newaxis, np.newaxis, :]).sum(axis=3)
+    slot_rank = rng.uniform(size=(len(candidates) * L, N, M)).argsort(axis=2).argsort(axis=2)
+    return slot_rank < d_array.reshape(-1, N)[:, :, np.newaxis]
+
+def refine_degree_distributions(candidates, M, L, rng=None):
+    """ Finite-frame evaluation of the [K, D] `candidates` with the batched peeling decoder (`decode_irsa_batch`):
+    for every number of users N = 1..M, the frames of all the candidates are decoded at once.
+    The frames are drawn from the `rng` np.random.Generator, by default from the global generator.
+    Return the [K] peak throughput max_N (average number of decoded users) / M and the [K] load N/M reaching it"""
+    avg_decoded = np.zeros((len(candidates), M))
+    for N in range(1, M + 1):
+        decoded = decode_irsa_batch(generate_incidence_batch_candidates(N, M, L, candidates, rng))
+        avg_decoded[:, N - 1] = decoded.sum(axis=1).reshape(len(candidates), L).mean(axis=1)
+    best_N = avg_decoded.argmax(axis=1)
+    return avg_decoded.max(axis=1) / M, (best_N + 1) / M
+
+def optimize_degree_distribution(M, max_degree=8, max_avg_degree=3.0, nb_candidates=2000, nb_refined=16, L=2000,
+                                 extra_candidates=(), cache_dir='simulation_cache', seed=1):
+    """ Search the degree distribution with the best peak throughput for a frame of `M` slots,
+    with at most `max_degree` replicas per user and an average degree of at most `max_avg_degree`:
+    `nb_candidates` random distributions (plus the `extra_candidates`) are screened by density evolution,
+    and the `nb_refined` best ones are evaluated on `L` frames per load with the batched peeling decoder.
+    The random draws come from independent Philox streams spawned from the `seed` (the global generator is not used).
+    The result is memoized in `cache_dir` like the simulated points (see `cached_simulation`), keyed on the parameters
+    of the search and the version of the simulation code.
+    Return a dictionary with the best distribution, its average degree, estimated peak throughput and load
+    """
+    params = {"M": M, "max_degree": max_degree, "max_avg_degree": max_avg_degree, "nb_candidates": nb_candidates,
+              "nb_refined": nb_refined, "L": L, "extra_candidates": extra_candidates}
+    point = {"function": "optimize_degree_distribution", "params": params, "seed": seed}
+    return memoize_point(cache_dir, point, lambda: search_degree_distribution(seed=seed, **params), CODE_VERSION)
+
+def search_degree_distribution(M, max_degree, max_avg_degree, nb_candidates, nb_refined, L, extra_candidates, seed):
+    """ Search of `optimize_degree_distribution`, without its cache """
+    # one stream for the sampling, the refinement and the final evaluation of the search
+    sampling_rng, refinement_rng, evaluation_rng = [np.random.Generator(np.random.Philox(child))
+                                                    for child in np.random.SeedSequence(seed).spawn(3)]
+    candidates = sample_degree_distributions(nb_candidates, max_degree, max_avg_degree, sampling_rng)
+    for extra_candidate in extra_candidates:
+        padded = np.zeros(max_degree + 1)
+        padded[:len(extra_candidate)] = extra_candidate
+        candidates = np.vstack([candidates, padded])
+    
+    # coarse screening on the loads of the frame, then finite-frame refinement of the best candidates
+    screened_throughput = screen_degree_distributions(candidates, M, np.arange(1, M + 1) / M)
+    refined = candidates[np.argsort(-screened_throughput)[:nb_refined]]
+    peak_throughput, _ = refine_degree_distributions(refined, M, L, refinement_rng)
+    best_dist = refined[np.argmax(peak_throughput)]
+    # estimate the throughput of the best candidate on new frames (its refinement estimate is biased upwards)
+    best_throughput, best_load = refine_degree_distributions(best_dist[np.newaxis, :], M, L, evaluation_rng)
+
+    result = {
+        "frame_size": M,
+        "lambda_dist": best_dist.tolist(),
+        "avg_degree": float(best_dist @ np.arange(max_degree + 1)),
+        "peak_throughput": float(best_throughput[0]),
+        "peak_load": float(best_load[0])
+    }
+    return result
+
+#%%
+# Result cache: every simulated point is stored in a file named after the hash of the simulation function,
+# its parameters, its seed and the version of the simulation code, so re-plotting a curve only reads the cache
+
+# Version of the simulation code (the functions defined above) and of the results store, part of the key of the cached points
+CODE_VERSION = get_code_version(*get_simulation_code(globals()), irsa_results_store)
+
+def cached_simulation(simul_function, seed, cache_dir='simulation_cache', max_cache_size=16 * 2**20, **params):
+    """Return `simul_function(**params, rng=...)` with a Philox generator seeded with `seed`, memoized on disk in `cache_dir`
+    (see `irsa_results_store.memoize_point`). When the cache exceeds `max_cache_size` bytes, the least recently used points are evicted"""
+    point = {"function": simul_function.__name__, "params": params, "seed": seed}
+    compute_result = lambda: float(simul_function(**params, rng=np.random.Generator(np.random.Philox(np.random.SeedSequence(seed)))))
+    return memoize_point(cache_dir, point, compute_result, CODE_VERSION, max_cache_size)
+
+#%%
+# Best distribution per frame size, compared with the hand-picked one (the search takes about 40 s on a fresh cache)
+if __name__ == "__main__":
+    hand_picked_dist = [0, 0.3, 0.15, 0.55]
+    for M in [15, 30]:
+        start_time = time.perf_counter()
+        result = optimize_degree_distribution(M, extra_candidates=[hand_picked_dist])
+        hand_picked_throughput, _ = refine_degree_distributions(np.array([hand_picked_dist]), M, 2000, np.random.Generator(np.random.Philox(np.random.SeedSequence(1))))
+        print("M=%d: best %s (average degree %.2f), peak throughput %.3f at load %.2f, hand-picked %.3f (%.1f s)" % (
+            M, np.round(result["lambda_dist"], 3), result["avg_degree"], result["peak_throughput"], result["peak_load"],
+            hand_picked_throughput[0], time.perf_counter() - start_time))
+
 #%%
 L = 1000 # number of simulations
 M = 15 # number of slots
 # lambda_dist = np_sol_dist # [0,0,1]
 lambda_dist=[0, 0.3, 0.15, 0.55]
-np.random.seed(1)
 
 xl = []
 yl = []
+start_time = time.perf_counter()
 for N in range(1,M+1,1): # number of users
-    avg_decoded = simul_nb_decoded(N, M, L, lambda_dist)
+    # one independent Philox stream per load, so that any point of the curve can be recomputed (or read from the cache) on its own
+    avg_decoded = cached_simulation(simul_nb_decoded_batched, [1, N], N=N, M=M, L=L, lambda_dist=lambda_dist)
     xl.append(N / M)  # Normalize N by M to get load
     yl.append(avg_decoded / M)  # Normalize avg_decoded by N to get throughput
+print("load curve computed in %.2f s" % (time.perf_counter() - start_time))
 xarray = np.array(xl)
 yarray = np.array(yl)
 
@@ -183,3 +635,32 @@ plt.show()
 # Save the figure# %%
 
 # %%
+
+#%%
+# Imperfect SIC load curve at graph-decoder speed with the residual-interference model calibrated with p06
+# The model is written by the interferer sweep of p06 (its "Fit the residual-interference model" cell)
+residual_model_path = os.path.join('simulation_results', 'residual_interference_model.json')
+if not os.path.exists(residual_model_path):
+    print(f"No residual-interference model in {residual_model_path}: run the interferer sweep of "
+          "p06_evaluating_SIC________DONE_____.py to calibrate it, then run this cell again")
+else:
+    residual_model = load_residual_interference_model(residual_model_path)
+
+    yl_imperfect = []
+    start_time = time.perf_counter()
+    for N in range(1,M+1,1): # number of users
+        # same frames as the perfect SIC curve
+        avg_decoded = cached_simulation(simul_nb_decoded_imperfect_sic_batched, [1, N], N=N, M=M, L=L, lambda_dist=lambda_dist, model=residual_model)
+        yl_imperfect.append(avg_decoded / M)
+    print("imperfect SIC load curve computed in %.2f s" % (time.perf_counter() - start_time))
+
+    plt.figure()
+    plt.plot(xarray, yarray, ".-", label="Perfect SIC")
+    plt.plot(xarray, np.array(yl_imperfect), ".-", label="Imperfect SIC (residual model)")
+    plt.plot(load, throughput, "x", label="Imperfect SIC (full PHY)")
+    plt.xlabel("Load")
+    plt.ylabel("Throughput")
+    plt.legend(loc="best")
+    plt.grid()
+    plt.savefig('irsa_performance_imperfect_sic_model_plot.png')
+    plt.show()